@@ -0,0 +1,121 @@
+import time
+import orjson
+
+from utils.logger_config import get_logger
+from utils.openai_client import get_client
+from utils import constants as Constants
+from agents import research_openai, refine_openai, metadata_openai, image_prompt_openai
+
+logger = get_logger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# --- Stage Registry ---
+# stage -> (request builder, response parser). Builders/parsers are the same ones the agents use live.
+STAGES = {
+    "research": (
+        research_openai.build_request,
+        lambda content, website_settings: content,
+    ),
+    "refine": (
+        refine_openai.build_request,
+        lambda content, website_settings: content,
+    ),
+    "metadata": (
+        metadata_openai.build_request,
+        lambda content, website_settings: metadata_openai.parse_response(content),
+    ),
+    "image_prompt": (
+        image_prompt_openai.build_request,
+        lambda content, website_settings: image_prompt_openai.parse_response(content, int(website_settings.get(Constants.NUM_IMAGE_PROMPTS, 3))),
+    ),
+}
+
+def _custom_id(job: dict) -> str:
+    return f"{job['post_item'].get(Constants.POST_ID)}:{job['stage']}"
+
+def _unique_jobs(jobs: list[dict]) -> dict[str, dict]:
+    """Returns the jobs keyed by custom_id, keeping the first of any repeated postId/stage (custom_ids must be unique)."""
+    unique = {}
+    for job in jobs:
+        unique.setdefault(_custom_id(job), job)
+    return unique
+
+def build_batch_file(jobs: list[dict]) -> bytes:
+    """
+    Builds the JSONL input for the Batch API.
+    Each job is {'stage': ..., 'post_item': ..., 'website_settings': ..., 'content': ...}, where
+    content is unused for 'research' (the title comes from post_item), the raw draft for 'refine'
+    and the refined article for the other stages. A repeated postId/stage is sent once.
+    """
+    unique = _unique_jobs(jobs)
+    if len(unique) < len(jobs):
+        logger.warning("Dropping %d duplicate batch jobs (same postId and stage).", len(jobs) - len(unique))
+    lines = []
+    for custom_id, job in unique.items():
+        builder, _ = STAGES[job["stage"]]
+        body = builder(job["post_item"], job["website_settings"], job.get("content"))
+        lines.append(orjson.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}))
+    return b"\n".join(lines)
+
+def submit(jobs: list[dict]) -> str:
+    """Uploads the jobs and starts a batch. Returns the batch id."""
+    client = get_client()
+    batch_file = build_batch_file(jobs)
+    input_file = client.files.create(file=("batch_input.jsonl", batch_file), purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window=BATCH_COMPLETION_WINDOW)
+    logger.info("Submitted batch %s with %d requests.", batch.id, batch_file.count(b"\n") + 1)
+    return batch.id
+
+def wait(batch_id: str, poll_seconds: float = 60, timeout_seconds: float = 24 * 3600):
+    """Polls until the batch reaches a terminal status. Returns the final batch object."""
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        batch = get_client().batches.retrieve(batch_id)
+        logger.info("Batch %s status: %s (%s)", batch_id, batch.status, batch.request_counts)
+        if batch.status in BATCH_TERMINAL_STATUSES:
+            return batch
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} did not finish within {timeout_seconds}s (status: {batch.status}).")
+        time.sleep(poll_seconds)
+
+def collect(batch, jobs: list[dict]) -> dict[str, object]:
+    """
+    Downloads the batch output and demultiplexes it by custom_id ('{postId}:{stage}').
+    Each value is the parsed agent result, or the Exception explaining why that request failed.
+    """
+    jobs_by_id = _unique_jobs(jobs) # Same first-wins choice as build_batch_file
+    results = {custom_id: ValueError(f"No result returned for '{custom_id}' (batch status: {batch.status}).") for custom_id in jobs_by_id}
+    if not batch.output_file_id:
+        return results
+
+    output = get_client().files.content(batch.output_file_id).read()
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        custom_id = record.get("custom_id")
+        job = jobs_by_id.get(custom_id)
+        if job is None:
+            continue
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            results[custom_id] = ValueError(f"Batch request '{custom_id}' failed: {record.get('error') or response.get('body')}")
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+            _, parser = STAGES[job["stage"]]
+            results[custom_id] = parser(content, job["website_settings"])
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            results[custom_id] = e
+    return results
+
+def run(jobs: list[dict], poll_seconds: float = 60, timeout_seconds: float = 24 * 3600) -> dict[str, object]:
+    """Submits the jobs as one batch, waits for it and returns the results keyed by '{postId}:{stage}'."""
+    batch = wait(submit(jobs), poll_seconds=poll_seconds, timeout_seconds=timeout_seconds)
+    results = collect(batch, jobs)
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    logger.info("Batch %s finished with status '%s': %d succeeded, %d failed.", batch.id, batch.status, len(results) - failed, failed)
+    return results
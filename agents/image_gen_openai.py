@@ -1,20 +1,31 @@
 import os
-from openai import OpenAI
 from utils.logger_config import get_logger
+from utils.openai_client import get_client
+from utils.rate_limiter import RateLimiter
+from utils.cache import TTLCache
+from utils.llm_cache import make_key
+from utils import constants as Constants
 
 logger = get_logger(__name__)
 
-# --- Initialize LLM Client ONLY ---
-try:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key or api_key == "NOT_SET":
-         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
-    # Use the same client initialized elsewhere if possible, but safe to re-init
-    llm_client = OpenAI(api_key=api_key) 
-    logger.info("OpenAI client initialized for ImageGenAgent.")
-except Exception as e:
-    logger.exception("CRITICAL: Error initializing LLM client for ImageGenAgent.")
-    llm_client = None
+# Client-side throttle shared by all image generation threads in this container
+IMAGE_RPM = int(os.environ.get('OPENAI_IMAGE_RPM', '50'))
+IMAGE_MAX_RETRIES = 5 # SDK retries 429/5xx with exponential backoff and honours retry-after
+_image_rate_limiter = RateLimiter(rpm=IMAGE_RPM, name="dall-e-3")
+
+IMAGE_MODEL = "dall-e-3"
+IMAGE_QUALITY = "standard" # or "hd"
+# Identical requests (re-runs, retries after a failed S3 save) reuse the generated URL.
+# OpenAI image URLs expire after ~1 hour, so entries are kept for a bit less than that.
+_image_url_cache = TTLCache(ttl_seconds=3000, max_entries=256)
+
+# Supported DALL-E 3 sizes by aspect ratio setting
+_SIZE_BY_RATIO = {
+    "16:9": "1792x1024",
+    "9:16": "1024x1792",
+    "1:1": "1024x1024",
+}
+_DEFAULT_SIZE = "1024x1024"
 
 def execute(post_item: dict, website_settings: dict, event_data: dict) -> str | None:
     """Generates an image using OpenAI's DALL-E model based on a prompt and settings."""
@@ -23,28 +34,30 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> str |
         logger.error("Missing 'prompt' in event_data for image gen agent.")
         raise ValueError("Missing 'prompt' for image gen agent.")
 
-    logger.info(f"Starting image generation for prompt: '{prompt[:100]}...'") # Log snippet
+    logger.info("Starting image generation for prompt: '%.100s...'", prompt) # Log snippet
 
-    # Extract potential settings (aspect ratio might be useful)
-    aspect_ratio = website_settings.get('imageAspectRatio', '16:9') # Example, DALL-E 3 might use '1024x1024', '1792x1024', '1024x1792'
-    # Map aspect ratio to DALL-E 3 sizes if needed, or use default
-    size = "1024x1024" # Default or choose based on aspect_ratio mapping
-    if aspect_ratio == "16:9":
-        size = "1792x1024"
-    elif aspect_ratio == "9:16": # Example vertical
-         size = "1024x1792"
+    # Map the website's aspect ratio setting to a supported DALL-E 3 size
+    aspect_ratio = website_settings.get(Constants.IMAGE_ASPECT_RATIO, '16:9')
+    size = _SIZE_BY_RATIO.get(aspect_ratio, _DEFAULT_SIZE)
 
     # Note: DALL-E 3 often performs better if style details are in the prompt itself,
     # rather than separate parameters, but 'style' parameter exists ('vivid' or 'natural').
     style_pref = website_settings.get('dalleStylePreference', 'vivid') # Example
 
+    cache_key = make_key(prompt, size, style_pref, IMAGE_QUALITY, IMAGE_MODEL)
+    cached_url = _image_url_cache.get(cache_key)
+    if cached_url:
+        logger.info("Reusing cached image URL for identical prompt/settings.")
+        return cached_url
+
     try:
         # --- Call DALL-E 3 API ---
-        response = llm_client.images.generate(
-            model="dall-e-3",
+        _image_rate_limiter.acquire()
+        response = get_client().with_options(max_retries=IMAGE_MAX_RETRIES).images.generate(
+            model=IMAGE_MODEL,
             prompt=prompt,
             size=size,
-            quality="standard", # or "hd"
+            quality=IMAGE_QUALITY,
             style=style_pref, # vivid or natural
             n=1, # Generate one image per prompt
             # response_format='url' # Default is URL for DALL-E 3 via OpenAI lib
@@ -53,15 +66,16 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> str |
         # --- Extract Image URL ---
         if response.data and len(response.data) > 0 and response.data[0].url:
             image_url = response.data[0].url
-            logger.info(f"Image generated successfully. URL: {image_url}")
+            logger.info("Image generated successfully. URL: %s", image_url)
+            _image_url_cache.set(cache_key, image_url)
             # NOTE: This URL might be temporary depending on OpenAI's policies.
             # For long-term storage, downloading the image and saving to S3 is safer.
             # We will handle the download/re-upload in the S3 Helper for robustness.
             return image_url 
         else:
-            logger.error(f"DALL-E API response did not contain expected image data/URL. Response: {response}")
+            logger.error("DALL-E API response did not contain expected image data/URL. Response: %s", response)
             raise ValueError("Failed to retrieve image URL from DALL-E response.")
 
     except Exception as e:
-        logger.exception(f"An error occurred during the DALL-E API call for prompt: '{prompt[:50]}...'")
+        logger.exception("An error occurred during the DALL-E API call for prompt: '%.50s...'", prompt)
         raise
\ No newline at end of file
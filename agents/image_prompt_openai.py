@@ -1,39 +1,29 @@
 # D:\Projects\Python\hcg-ai-content-generator\agents\image_prompt_openai.py
-import os
-import json
-from openai import OpenAI
+import orjson
+from itertools import islice
+from pydantic import ValidationError
 
 from utils.logger_config import get_logger
+from utils.openai_client import stream_chat_completion
+from utils.llm_cache import SemanticCache, make_key
+from utils.tokens import article_snippet
+from utils import slugify
 from utils import constants as Constants
+from agents.schemas import PromptSlugResponse, PROMPT_SLUG_JSON_SCHEMA
 
 logger = get_logger(__name__)
 
-# --- Initialize LLM Client ONLY ---
-try:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key or api_key == "NOT_SET":
-         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
-    llm_client = OpenAI(api_key=api_key)
-    logger.info("OpenAI client initialized for ImagePromptAgent.")
-except Exception as e:
-    logger.exception("CRITICAL: Error initializing LLM client for ImagePromptAgent.")
-    llm_client = None
+# Near-duplicate articles (re-runs, minor edits) with the same settings reuse earlier prompts
+_prompt_cache = SemanticCache("image_prompts", threshold=0.92)
 
-def execute(post_item: dict, website_settings: dict, event_data: dict) -> list[dict]:
-    """Generates image prompts AND corresponding URL-safe slugs."""
-
-    refined_article_content = event_data.get('refined_article_content') # Get text from event_data
-    if not refined_article_content:
-        logger.error("Missing 'refined_article_content' in event_data for image prompt agent.")
-        raise ValueError("Missing 'refined_article_content' for image prompt agent.")
-
-    num_prompts = int(website_settings.get(Constants.NUM_IMAGE_PROMPTS, 3)) # Example: get desired number from settings    
-    image_style = website_settings.get(Constants.IMAGE_STYLE_PROMPT, 'realistic photo') # Use Constant
-    blog_title = post_item.get(Constants.BLOG_TITLE, 'the article topic') # Get from post_item
+# Articles per batched request; keeps k snippets plus the answer well inside the context window
+BATCH_MAX_ARTICLES = 4
 
-    logger.info(f"Starting image prompt and slug generation. Aiming for {num_prompts}.")
+# --- Prompt Templates (parsed once at import, filled per call with str.format) ---
+# The system prompt is static so it stays a cacheable prefix; the style is given in the user message
+_SYSTEM_PROMPT = "You are a helpful assistant generating JSON lists of image prompts and corresponding URL-safe slugs based on article text, in the image style the user asks for. Follow format instructions precisely."
 
-    prompt = f"""
+_USER_TMPL = """
     Please act as a creative visual director and SEO assistant. Analyze the following article draft about "{blog_title}" and generate **exactly {num_prompts}** diverse and compelling text prompts suitable for an AI image generation model (like DALL-E 3).
 
     **Instructions for Prompts:**
@@ -43,55 +33,190 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> list[d
     - Avoid prompts that are just summaries of text sections. Focus on visual representation.
     
 
+    **Instructions for Slugs:**
+    - For each prompt, also generate a short (2-5 words), descriptive slug based on the prompt's core subject.
+    - Slugs must be URL-safe: lowercase letters, numbers, and hyphens (-) only. Remove common articles (a, an, the).
+
     **Output Format:**
-    - Output **only** a valid JSON list of objects containing **exactly {num_prompts}** objects.
-    - Example: ["A futuristic cityscape with flying cars, {image_style}", "A serene forest with a mystical creature, {image_style}", "A close-up of a flower with dew drops, {image_style}"]
-    - Example format: ["prompt 1...", "prompt 2...", "prompt 3..."]
+    - Output **only** a valid JSON object with a single key "results" holding a list of **exactly {num_prompts}** objects, each with the keys "prompt" (string) and "slug" (string).
+    - Example: {{"results": [{{"prompt": "A futuristic cityscape with flying cars, {image_style}", "slug": "futuristic-cityscape-flying-cars"}}, {{"prompt": "A serene forest with a mystical creature, {image_style}", "slug": "serene-forest-mystical-creature"}}]}}
     - Ensure the list contains **{num_prompts}** items.
     - Ensure the JSON is valid and well-formed.
 
     **Refined Article Draft:**
     --- START OF DRAFT ---
-    {refined_article_content[:8000]} 
+    {snippet} 
     --- END OF DRAFT (Snippet)--- 
-    """ 
+    """
+
+_BATCH_USER_TMPL = """
+    Please act as a creative visual director. For **each** article in the JSON below, generate **exactly {num_prompts}** diverse and compelling text prompts suitable for an AI image generation model (like DALL-E 3).
+
+    **Instructions for Prompts:**
+    - Each prompt should describe a distinct visual concept relevant to different sections or key ideas within its article.
+    - Prompts should be descriptive, focusing on visual elements (subjects, actions, setting, mood, style).
+    - Incorporate the desired overall image style: "{image_style}". Mention this style within each prompt.
+
+    **Output Format:**
+    - Output **only** a valid JSON object: {{"results": [{{"id": "<article id>", "prompts": ["prompt 1...", "prompt 2..."]}}]}}
+    - Include one entry per article, using the article's "id" unchanged.
+
+    **Articles:**
+    {articles_json}
+    """
+
+def _extract_prompt_list(output_data) -> list | None:
+    """Returns the list of prompts from a parsed response (a bare list or under a common key)."""
+    if isinstance(output_data, list):
+        return output_data
+    return output_data.get("prompts") or output_data.get("image_prompts")
+
+def _parse_prompt_list(prompt_list, num_prompts: int) -> list[str] | None:
+    """
+    Validates and trims the model's prompt list in one pass, stopping at num_prompts.
+    Non-string or blank entries are skipped; returns None if the value is not a list.
+    """
+    if not isinstance(prompt_list, list):
+        return None
+    return [p for p in islice(prompt_list, num_prompts) if isinstance(p, str) and p.strip()]
+
+def _build_request_from_snippet(post_item: dict, website_settings: dict, content_snippet: str) -> dict:
+    """Builds the request from an article snippet that is already within the token budget."""
+    num_prompts = int(website_settings.get(Constants.NUM_IMAGE_PROMPTS, 3))
+    image_style = website_settings.get(Constants.IMAGE_STYLE_PROMPT, 'realistic photo')
+    blog_title = post_item.get(Constants.BLOG_TITLE, 'the article topic')
+    prompt = _USER_TMPL.format(blog_title=blog_title, num_prompts=num_prompts, image_style=image_style, snippet=content_snippet)
+    return {
+        "model": "gpt-4o",
+        "response_format": { "type": "json_schema", "json_schema": PROMPT_SLUG_JSON_SCHEMA },
+        "max_tokens": 200 * num_prompts + 100, # ~200 tokens per prompt/slug pair plus the JSON wrapper
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.8,
+    }
+
+def build_request(post_item: dict, website_settings: dict, refined_article_content: str) -> dict:
+    """Returns the chat.completions.create arguments for a prompt/slug request (shared with the batch runner)."""
+    content_snippet = article_snippet(refined_article_content)
+    return _build_request_from_snippet(post_item, website_settings, content_snippet)
+
+def parse_response(response_content: str, num_prompts: int) -> list[dict]:
+    """
+    Parses the LLM's {"results": [{"prompt", "slug"}]} JSON into at most num_prompts prompt/slug pairs.
+    'slug' is None where the model gave no usable slug, so the caller can fill it in.
+    """
+    try:
+        # The json_schema response format fixes the top-level shape, so no key fallbacks are needed
+        parsed = PromptSlugResponse.model_validate_json(response_content)
+    except ValidationError as json_e:
+         logger.error("Failed to parse JSON response from LLM: %s. Response was: %s", json_e, response_content)
+         raise ValueError("Failed to parse image prompt list from LLM response.") from json_e
+
+    final_prompts = [
+        {"prompt": item.prompt, "slug": slugify.clean(item.slug, default=f"image-{i}") if item.slug and item.slug.strip() else None}
+        for i, item in enumerate(islice(parsed.results, num_prompts))
+    ]
+    if not final_prompts:
+        raise ValueError("LLM response yielded no valid prompts.")
+    if len(final_prompts) < num_prompts:
+         logger.warning("LLM returned only %d prompts, expected %d.", len(final_prompts), num_prompts)
+
+    logger.info("Successfully parsed %d image prompts from LLM response.", len(final_prompts))
+    return final_prompts
+
+def execute(post_item: dict, website_settings: dict, event_data: dict) -> list[dict]:
+    """
+    Generates image prompts AND corresponding URL-safe slugs in a single LLM call.
+    Returns [{'prompt': '...', 'slug': '...'}]; 'slug' is None where the model gave no usable slug.
+    """
+
+    refined_article_content = event_data.get('refined_article_content') # Get text from event_data
+    if not refined_article_content:
+        logger.error("Missing 'refined_article_content' in event_data for image prompt agent.")
+        raise ValueError("Missing 'refined_article_content' for image prompt agent.")
+
+    num_prompts = int(website_settings.get(Constants.NUM_IMAGE_PROMPTS, 3)) # Example: get desired number from settings    
+    image_style = website_settings.get(Constants.IMAGE_STYLE_PROMPT, 'realistic photo') # Use Constant
+    blog_title = post_item.get(Constants.BLOG_TITLE, 'the article topic') # Get from post_item
+
+    logger.info("Starting image prompt and slug generation. Aiming for %d.", num_prompts)
+
+    cache_namespace = make_key(image_style, blog_title, num_prompts)
+    content_snippet = article_snippet(refined_article_content) # Reused for the cache key and the prompt
+    # Embeds the snippet up front only if there are earlier entries to match; otherwise alongside the LLM call
+    cached_prompts, pending_embedding = _prompt_cache.lookup(cache_namespace, content_snippet,
+                                                             bypass=bool(event_data.get(Constants.BYPASS_CACHE)))
+    if cached_prompts:
+        logger.info("Returning %d cached image prompts.", len(cached_prompts))
+        return [dict(pair) for pair in cached_prompts]
+
+    request = _build_request_from_snippet(post_item, website_settings, content_snippet)
     
     logger.info("Constructed Image Prompt/Slug Generation Prompt - sending to LLM...")
     
     try:
-        response = llm_client.chat.completions.create(
-            model="gpt-4o", 
-            response_format={ "type": "json_object" }, 
+        # Streamed so progress is visible and a malformed response is abandoned early
+        response_content = stream_chat_completion(expect_json=True, **request)
+        logger.debug("Raw LLM response for image prompts/slugs: %s", response_content)
+
+        final_prompts = parse_response(response_content, num_prompts)
+        _prompt_cache.store(cache_namespace, content_snippet, pending_embedding, [dict(pair) for pair in final_prompts])
+        return final_prompts
+
+    except Exception as e:
+        logger.exception("An error occurred during the image prompt/slug LLM call.")
+        raise
+
+def execute_batch(articles: list[dict], website_settings: dict) -> dict[str, list[str]]:
+    """
+    Generates image prompts for several articles sharing one website's settings.
+    Each article is {'id': ..., 'title': ..., 'content': ...}; returns {id: [prompts]}.
+    Articles are sent BATCH_MAX_ARTICLES per request so the system prompt and round-trip are shared.
+    """
+    num_prompts = int(website_settings.get(Constants.NUM_IMAGE_PROMPTS, 3))
+    image_style = website_settings.get(Constants.IMAGE_STYLE_PROMPT, 'realistic photo')
+
+    results: dict[str, list[str]] = {}
+    for start in range(0, len(articles), BATCH_MAX_ARTICLES):
+        chunk = articles[start:start + BATCH_MAX_ARTICLES]
+        payload = {"articles": [
+            {"id": str(article["id"]),
+             "title": article.get("title") or "the article topic",
+             "snippet": article_snippet(article["content"])}
+            for article in chunk
+        ]}
+        prompt = _BATCH_USER_TMPL.format(num_prompts=num_prompts, image_style=image_style, articles_json=orjson.dumps(payload).decode())
+        logger.info("Requesting image prompts for %d articles in one call.", len(chunk))
+
+        response_content = stream_chat_completion(
+            expect_json=True,
+            model="gpt-4o",
+            response_format={ "type": "json_object" },
             messages=[
-                 {"role": "system", "content": f"You are a helpful assistant generating JSON lists of image prompts and corresponding URL-safe slugs based on article text. Desired style: '{image_style}'. Follow format instructions precisely."},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.8,
         )
-        response_content = response.choices[0].message.content
-        logger.debug(f"Raw LLM response for image prompts/slugs: {response_content}")
 
         try:
-            output_data = json.loads(response_content)
-            # Expecting a list directly, or under a common key
-            prompt_list = output_data if isinstance(output_data, list) else output_data.get("prompts") or output_data.get("image_prompts")
-
-            if isinstance(prompt_list, list) and all(isinstance(p, str) for p in prompt_list):
-                final_prompts = prompt_list[:num_prompts] # Trim if needed
-                if len(final_prompts) < num_prompts:
-                     logger.warning(f"LLM returned only {len(final_prompts)} prompts, expected {num_prompts}.")
-                if not final_prompts: raise ValueError("LLM response yielded no valid prompts.")
-
-                logger.info(f"Successfully parsed {len(final_prompts)} image prompts from LLM response.")
-                return final_prompts
-            else:
-                 logger.error(f"LLM response was valid JSON but not the expected list of strings format: {output_data}")
-                 raise ValueError("LLM did not return the expected JSON list format for prompts.")
-        except (json.JSONDecodeError, TypeError, AttributeError) as json_e:
-             logger.error(f"Failed to parse JSON response from LLM: {json_e}. Response was: {response_content}")
-             raise ValueError("Failed to parse image prompt list from LLM response.") from json_e
+            entries = orjson.loads(response_content).get("results") or []
+        except (orjson.JSONDecodeError, AttributeError) as json_e:
+            logger.error("Failed to parse batched JSON response from LLM: %s. Response was: %s", json_e, response_content)
+            raise ValueError("Failed to parse batched image prompt results from LLM response.") from json_e
 
-    except Exception as e:
-        logger.exception("An error occurred during the image prompt/slug LLM call.")
-        raise
-    
\ No newline at end of file
+        # Fan out by id; anything malformed or missing is left out for the caller to retry singly
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            prompt_list = _parse_prompt_list(_extract_prompt_list(entry), num_prompts)
+            if prompt_list:
+                results[str(entry.get("id"))] = prompt_list
+
+        missing = [a["id"] for a in payload["articles"] if a["id"] not in results]
+        if missing:
+            logger.warning("Batched prompt response had no valid prompts for article ids: %s", missing)
+
+    return results
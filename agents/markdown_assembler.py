@@ -1,12 +1,39 @@
-import yaml
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 
 from utils.logger_config import get_logger
 from utils import constants as Constants
+from utils import frontmatter
 
 logger = get_logger(__name__)
 
+# Paragraph separator (blank line, possibly containing whitespace), compiled once at import
+_PARA_SPLIT_RE = re.compile(r'\n\s*\n')
+
+def _image_positions(num_paragraphs: int, num_images: int) -> dict[int, list[int]]:
+    """
+    Maps paragraph index -> indexes of the images to insert after it.
+    Images are spread evenly, never before the second paragraph nor (with more than two paragraphs)
+    after the last one, and every image is placed (short articles get several images after the same paragraph).
+    """
+    last_slot = num_paragraphs - 2 if num_paragraphs > 2 else num_paragraphs - 1
+    positions = {}
+    for k in range(num_images):
+        i = min(max(1, (k + 1) * num_paragraphs // (num_images + 1)), last_slot)
+        positions.setdefault(i, []).append(k)
+    return positions
+
+def _interleave_images(paragraphs: list[str], image_s3_uris: list[str], blog_title: str):
+    """Yields the paragraphs in order, with the images inserted at their precomputed positions."""
+    positions = _image_positions(len(paragraphs), len(image_s3_uris))
+    for i, para in enumerate(paragraphs):
+        yield para
+        for image_index in positions.get(i, ()):
+            # Basic alt text - could be improved using slugs or metadata later
+            alt_text = f"Image related to {blog_title} - {image_index + 1}"
+            yield f"\n\n![{alt_text}]({image_s3_uris[image_index]})\n"
+            logger.debug("Inserted image %d after paragraph %d", image_index + 1, i + 1)
+
 def execute(post_item: dict, website_settings: dict, event_data: dict) -> str:
     """Assembles the final Markdown file from refined text, images, and metadata."""
 
@@ -27,13 +54,13 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> str:
     if metadata.get("metaDescription"): front_matter['description'] = metadata['metaDescription']
     if metadata.get("keywords"): front_matter['keywords'] = metadata['keywords']
     # Add other relevant metadata from post_item or website_settings if desired
-    front_matter['date'] = datetime.utcnow().isoformat() + "Z" 
+    front_matter['date'] = datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
 
     final_markdown = ""
     if front_matter:
         try:
-            # Use safe_dump, disable aliases for cleaner output
-            yaml_string = yaml.safe_dump(front_matter, default_flow_style=False, allow_unicode=True, sort_keys=False)
+            # Flat str/list values are written directly; PyYAML is only loaded for anything else
+            yaml_string = frontmatter.dump(front_matter)
             final_markdown += f"---\n{yaml_string}---\n\n"
             logger.info("Generated YAML front matter.")
         except Exception as e:
@@ -41,41 +68,25 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> str:
             # Proceed without front matter if YAML fails
 
     # --- 2. Simple Image Placement Strategy ---
-    # Split content into paragraphs (basic split on double newline)
-    paragraphs = re.split(r'\n\s*\n', refined_content.strip())
-    
-    # Remove empty paragraphs that might result from splitting
-    paragraphs = [p for p in paragraphs if p.strip()] 
+    if not image_s3_uris:
+        # Nothing to place (common for drafts) - skip splitting the article into paragraphs
+        logger.info("No images to place; using refined content as-is.")
+        logger.info("Markdown assembly complete.")
+        return final_markdown + refined_content
+
+    # Split content into paragraphs (basic split on double newline), dropping empty ones in the same pass
+    paragraphs = [p for p in _PARA_SPLIT_RE.split(refined_content.strip()) if p.strip()]
     
     num_paragraphs = len(paragraphs)
     num_images = len(image_s3_uris)
     
     logger.info(f"Attempting to place {num_images} images into {num_paragraphs} paragraphs.")
 
-    # Simple strategy: Insert an image roughly every N paragraphs
+    # Simple strategy: Spread the images evenly between paragraphs
     # Avoid inserting right at the beginning or very end if possible
     if num_images > 0 and num_paragraphs > 1:
-        insert_interval = max(1, (num_paragraphs - 1) // (num_images + 1)) # Calculate interval, ensure at least 1
-        image_index = 0
-        content_with_images = []
-        for i, para in enumerate(paragraphs):
-            content_with_images.append(para)
-            # Insert after paragraph `i`, if interval met and images remain
-            # Start inserting after the first paragraph (i > 0)
-            if i > 0 and (i + 1) % insert_interval == 0 and image_index < num_images:
-                img_uri = image_s3_uris[image_index]
-                # Basic alt text - could be improved using slugs or metadata later
-                alt_text = f"Image related to {blog_title} - {image_index + 1}"
-                image_markdown = f"\n\n![{alt_text}]({img_uri})\n"
-                content_with_images.append(image_markdown)
-                logger.debug(f"Inserted image {image_index+1} after paragraph {i+1}")
-                image_index += 1
-        
-        # If any images remain (e.g., very short article), append them at the end? Or discard?
-        # For now, we just place based on interval.
-
-        # Join paragraphs and images back together
-        body_content = "\n\n".join(content_with_images)
+        # Join paragraphs and images back together in a single pass
+        body_content = "\n\n".join(_interleave_images(paragraphs, image_s3_uris, blog_title))
     else:
         # No images or not enough paragraphs, just use original content
         body_content = refined_content
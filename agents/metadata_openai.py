@@ -1,23 +1,70 @@
-import os
-import json
-from openai import OpenAI
+from pydantic import ValidationError
 
 from utils.logger_config import get_logger
+from utils.llm_cache import cached_chat, make_key
+from utils.tokens import article_snippet
 from utils import constants as Constants
+from utils.website_context import WebsiteContext
+from agents.schemas import MetadataResponse, METADATA_JSON_SCHEMA
 
 logger = get_logger(__name__)
 
-# --- Initialize LLM Client ONLY ---
-try:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key or api_key == "NOT_SET":
-         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
-    # Use the same client initialized elsewhere if possible, but safe to re-init
-    llm_client = OpenAI(api_key=api_key) 
-    logger.info("OpenAI client initialized for MetadataAgent.")
-except Exception as e:
-    logger.exception("CRITICAL: Error initializing LLM client for MetadataAgent.")
-    llm_client = None
+# --- Prompt Templates ---
+# Built once at import; identical for every request so OpenAI's automatic prompt caching can reuse it as a prefix
+_SYSTEM_PROMPT = """You are an expert SEO analyst generating metadata as a valid JSON object with keys 'metaTitle', 'metaDescription', and 'keywords'. Analyze the refined article draft you are given and generate relevant SEO metadata.
+
+**Instructions:**
+- Generate an SEO-optimized Meta Title (typically 50-60 characters). It should be compelling and include the primary keyword(s).
+- Generate a compelling Meta Description (typically 150-160 characters). It should accurately summarize the article and encourage clicks.
+- Generate a list of 5-10 relevant Keywords/Keyphrases (mix of short and long-tail) based *only* on the article's content. Include core website keywords only if they are also highly relevant to this specific article.
+- Consider the provided SEO instructions.
+- Output **only** a valid JSON object with the following exact keys: "metaTitle" (string), "metaDescription" (string), and "keywords" (list of strings).
+- Example JSON output: {"metaTitle": "Example Title | Site Name", "metaDescription": "Short compelling summary...", "keywords": ["keyword1", "long tail keyword 2"]}"""
+
+_USER_TMPL = """
+    **Article Context:**
+    - Focuses on the topic: "{blog_title}"
+    - Core Website Keywords (if provided): {core_keywords}
+    - Specific SEO Instructions: {seo_instructions}
+
+    **Refined Article Draft:**
+    --- START OF DRAFT ---
+    {content_snippet}
+    --- END OF DRAFT (Snippet)---
+    """
+
+def build_request(post_item: dict, website_settings: dict, refined_article_content: str, ctx: WebsiteContext | None = None) -> dict:
+    """Returns the chat.completions.create arguments for a metadata request (shared with the batch runner)."""
+    blog_title = post_item.get(Constants.BLOG_TITLE, "Article Title")
+    ctx = ctx or WebsiteContext.from_settings(website_settings)
+    content_snippet = article_snippet(refined_article_content)
+
+    # Only the per-article context goes in the user message; the instructions are a static, cacheable prefix
+    prompt = _USER_TMPL.format(blog_title=blog_title, seo_instructions=ctx.seo_instructions, content_snippet=content_snippet,
+                               core_keywords=ctx.keywords_joined)
+
+    return {
+        "model": "gpt-4o", # Or gpt-3.5-turbo might suffice
+        "response_format": { "type": "json_schema", "json_schema": METADATA_JSON_SCHEMA },
+        "max_tokens": 400, # Title + description + ~10 keywords fit comfortably; caps generation time
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.5, # Lower temperature for more predictable SEO text
+    }
+
+def parse_response(response_content: str) -> dict:
+    """Parses and validates the metadata JSON returned by the LLM."""
+    try:
+        # Parses and validates in one step (pydantic-core); extra keys are dropped
+        metadata = MetadataResponse.model_validate_json(response_content)
+    except ValidationError as e:
+        logger.error(f"LLM response was not the expected metadata JSON: {e}. Response was: {response_content}")
+        raise ValueError("Failed to parse metadata JSON from LLM response.") from e
+
+    logger.info(f"Successfully parsed metadata from LLM response.")
+    return metadata.model_dump()
 
 def execute(post_item: dict, website_settings: dict, event_data: dict) -> dict:
     """Generates SEO metadata (meta title, description, keywords) based on refined article text."""
@@ -28,71 +75,28 @@ def execute(post_item: dict, website_settings: dict, event_data: dict) -> dict:
         raise ValueError("Missing 'refined_article_content' for metadata agent.")
 
     blog_title = post_item.get(Constants.BLOG_TITLE, "Article Title")
-    seo_instructions = website_settings.get(Constants.SEO_INSTRUCTIONS, "Generate standard SEO metadata.")
-    core_keywords_list = website_settings.get(Constants.CORE_KEYWORDS, [])
+    ctx = WebsiteContext.from_settings(website_settings)
 
     logger.info(f"Starting metadata generation for title: {blog_title}")
 
-    # --- Construct Prompt ---
-    prompt = f"""
-    Please act as an expert SEO analyst. Analyze the following refined article draft about "{blog_title}" and generate relevant SEO metadata.
-
-    **Article Context:**
-    - Focuses on the topic: "{blog_title}"
-    - Core Website Keywords (if provided): {', '.join(core_keywords_list) if core_keywords_list else 'N/A'}
-    - Specific SEO Instructions: {seo_instructions}
-
-    **Instructions:**
-    - Generate an SEO-optimized Meta Title (typically 50-60 characters). It should be compelling and include the primary keyword(s).
-    - Generate a compelling Meta Description (typically 150-160 characters). It should accurately summarize the article and encourage clicks.
-    - Generate a list of 5-10 relevant Keywords/Keyphrases (mix of short and long-tail) based *only* on the article's content. Include core website keywords only if they are also highly relevant to this specific article.
-    - Consider the provided SEO instructions.
-    - Output **only** a valid JSON object with the following exact keys: "metaTitle" (string), "metaDescription" (string), and "keywords" (list of strings).
-    - Example JSON output: {{"metaTitle": "Example Title | Site Name", "metaDescription": "Short compelling summary...", "keywords": ["keyword1", "long tail keyword 2"]}}
-
-    **Refined Article Draft:**
-    --- START OF DRAFT ---
-    {refined_article_content[:8000]} 
-    --- END OF DRAFT (Snippet)--- 
-    """ 
-    
+    request = build_request(post_item, website_settings, refined_article_content, ctx=ctx)
     logger.info(f"Constructed Metadata Generation Prompt - sending to LLM")
 
     try:
         # --- Call LLM API ---
-        response = llm_client.chat.completions.create(
-            model="gpt-4o", # Or gpt-3.5-turbo might suffice
-            response_format={ "type": "json_object" }, 
-            messages=[
-                 {"role": "system", "content": "You are an SEO analyst generating metadata as a valid JSON object with keys 'metaTitle', 'metaDescription', and 'keywords'."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5, # Lower temperature for more predictable SEO text
+        # Re-runs and near-identical drafts with the same title/SEO settings reuse the earlier metadata
+        response_content = cached_chat(
+            semantic_namespace=make_key(blog_title, ctx.seo_instructions, ctx.keywords_joined),
+            semantic_text=article_snippet(refined_article_content), # Cached, so not re-tokenized
+            bypass_cache=bool(event_data.get(Constants.BYPASS_CACHE)),
+            **request
         )
         
-        response_content = response.choices[0].message.content
         logger.debug(f"Raw LLM response for metadata: {response_content}")
 
         # --- Parse Response ---
-        try:
-            metadata_dict = json.loads(response_content)
-            # Basic validation of expected keys and types
-            if not isinstance(metadata_dict, dict) or \
-               "metaTitle" not in metadata_dict or \
-               "metaDescription" not in metadata_dict or \
-               "keywords" not in metadata_dict or \
-               not isinstance(metadata_dict["keywords"], list):
-                logger.error(f"LLM response JSON missing required keys or has wrong types: {metadata_dict}")
-                raise ValueError("LLM did not return the expected JSON structure for metadata.")
-                
-            logger.info(f"Successfully parsed metadata from LLM response.")
-            # Return the validated dictionary
-            return metadata_dict 
-
-        except (json.JSONDecodeError, TypeError, AttributeError) as json_e:
-             logger.error(f"Failed to parse JSON response from LLM for metadata: {json_e}. Response was: {response_content}")
-             raise ValueError("Failed to parse metadata JSON from LLM response.") from json_e
+        return parse_response(response_content)
 
     except Exception as e:
         logger.exception(f"An error occurred during the metadata generation LLM call for title '{blog_title}'.")
-        raise
\ No newline at end of file
+        raise
@@ -1,96 +1,154 @@
-import os
-from openai import OpenAI
+from functools import lru_cache
 
 from utils.logger_config import get_logger
+from utils.llm_cache import cached_chat, make_key
+from utils.cache import TTLCache
 from utils import constants as Constants
+from utils.concurrency import many
+from utils.tokens import count_tokens, truncate_to_tokens
+from utils.website_context import WebsiteContext
 
 logger = get_logger(__name__)
 
-# --- Initialize LLM Client ONLY ---
-try:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key or api_key == "NOT_SET":
-         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
-    llm_client = OpenAI(api_key=api_key)
-    logger.info("OpenAI client initialized for RefineAgent.")
-except Exception as e:
-    logger.exception("CRITICAL: Error initializing LLM client for RefineAgent.")
-    llm_client = None
+# --- Model Routing ---
+REFINE_MODEL = "gpt-4o"
 
-def execute(post_item: dict, website_settings: dict, event_data: dict) -> str:
-    """Refines the provided raw article text using OpenAI based on website settings."""
-    
-    if not llm_client:
-        logger.error("LLM Client not initialized during refine function call.")
-        raise ValueError("LLM Client not initialized.")
-    
-    raw_article_content = event_data.get('raw_article_content')
-    if not raw_article_content:
-        logger.error("Missing 'raw_article_content' in event_data for refine agent.")
-        raise ValueError("Missing 'raw_article_content' for refine agent.")
+def _select_model(website_settings: dict) -> str:
+    """
+    Returns the model for a refine request: the site's refineModel setting, else REFINE_MODEL.
+    A cheaper model (e.g. gpt-4o-mini) is opt-in per site; draft size says little about how much work a refine needs.
+    """
+    return website_settings.get(Constants.REFINE_MODEL) or REFINE_MODEL
 
-    # --- Extract Settings and Construct Prompt ---
-    blog_title = post_item.get(Constants.BLOG_TITLE, 'the provided topic') # Get from post_item
-    brand_tone = website_settings.get(Constants.BRAND_TONE, 'neutral and informative') # Use Constant
-    # Fetch numeric values for prompt formatting, handle potential non-numeric data
-    try:
-      min_len_str = str(int(website_settings.get(Constants.ARTICLE_LENGTH_MIN, 1500)))
-      max_len_str = str(int(website_settings.get(Constants.ARTICLE_LENGTH_MAX, 2500)))
-    except (ValueError, TypeError):
-        logger.warning("Could not parse article length settings, using defaults for prompt.")
-        min_len_str = "1500"
-        max_len_str = "2500"
-        
-    target_audience = website_settings.get(Constants.TARGET_AUDIENCE, 'a general audience')
+# --- Draft Size Limits (tokens) ---
+# gpt-4o has a 128k context and the refined article has to fit in the output as well; anything this large
+# is a broken upstream draft, so fail before paying for a round-trip that would error or be cut off
+DRAFT_MAX_TOKENS = 100_000
+DRAFT_TRUNCATE_TOKENS = 90_000
 
-    logger.info(f"Starting refine process. Original length: {len(raw_article_content)}")
+def _bound_draft(raw_article_content: str) -> str:
+    """Raises ValueError for drafts over DRAFT_MAX_TOKENS and truncates those over DRAFT_TRUNCATE_TOKENS."""
+    num_tokens = count_tokens(raw_article_content)
+    if num_tokens > DRAFT_MAX_TOKENS:
+        raise ValueError(f"Draft is {num_tokens} tokens, above the {DRAFT_MAX_TOKENS}-token refine limit.")
+    if num_tokens > DRAFT_TRUNCATE_TOKENS:
+        logger.warning(f"Draft is {num_tokens} tokens; truncating to {DRAFT_TRUNCATE_TOKENS} for refine.")
+        return truncate_to_tokens(raw_article_content, DRAFT_TRUNCATE_TOKENS)
+    return raw_article_content
+
+# --- Direct Responses (no LLM call) ---
+# Drafts this short are a broken upstream step, not an article; refining them would pay for a full call for nothing
+MIN_REFINE_WORDS = 100
+# Digests of recently refined outputs: a draft that is already one of them (e.g. a re-run fed the refined
+# file back in) is returned as-is instead of being refined again
+_refined_digests = TTLCache(ttl_seconds=3600, max_entries=256)
+
+def _digest(text: str) -> str:
+    """Returns a whitespace-insensitive hash of text."""
+    return make_key(" ".join(text.split()))
 
-    # Construct detailed refine prompt
-    prompt = f"""
-    Please act as an expert copy editor and writer. Your task is to rewrite / refine the following raw article draft on the topic "{blog_title}" to match specific brand guidelines and length constraints.
+# --- Prompt Templates ---
+# Everything that is the same for every request lives in the system prompt, so it forms an identical
+# prefix that OpenAI's automatic prompt caching can reuse. Per-request values and the draft follow in the user message.
+_SYSTEM_PROMPT = """You are an expert copy editor and writer. Your task is to rewrite / refine raw article drafts to match specific brand guidelines and length constraints, which are given with each draft.
+
+**Content Constraints:**
+- Retain all key factual information, concepts, and core arguments from the original draft. Do not omit important details or sections.
+- Ensure the final article flows logically and is highly engaging for the target audience.
+- Adjust the writing style, vocabulary, and sentence structure to perfectly match the specified brand tone.
+- The final article length MUST be within the given word range. Expand or condense sections, examples, or explanations thoughtfully as needed to meet this length requirement while preserving all key information.
+- Correct any grammatical errors, spelling mistakes, or awkward phrasing in the original draft.
+- Maintain or create appropriate headings and subheadings for structure and readability.
+- Output only the refined article content itself, including the title as the first line. Do not include any introductory or concluding remarks about the refine process itself."""
+
+_USER_TMPL = """
+    Please refine the following raw article draft on the topic "{blog_title}".
 
     **Brand Guidelines:**
     - Brand Tone: {brand_tone}
     - Target Audience: {target_audience}
-
-    **Content Constraints:**
-    - Retain all key factual information, concepts, and core arguments from the original draft. Do not omit important details or sections.
-    - Ensure the final article flows logically and is highly engaging for the target audience.
-    - Adjust the writing style, vocabulary, and sentence structure to perfectly match the specified brand tone.
-    - The final article length MUST be between {min_len_str} and {max_len_str} words. Expand or condense sections, examples, or explanations thoughtfully as needed to meet this length requirement while preserving all key information.
-    - Correct any grammatical errors, spelling mistakes, or awkward phrasing in the original draft.
-    - Maintain or create appropriate headings and subheadings for structure and readability.
-    - Output only the refined article content itself, including the title as the first line. Do not include any introductory or concluding remarks about the refine process itself.
+    - Length: between {min_len} and {max_len} words
 
     **Original Raw Article Draft:**
     --- START OF DRAFT ---
-    {raw_article_content}
+    {draft}
     --- END OF DRAFT ---
 
     Please provide the fully refined article below:
     """
+
+def _escape_braces(value: str) -> str:
+    return value.replace('{', '{{').replace('}', '}}')
+
+@lru_cache(maxsize=64)
+def _user_skeleton(ctx: WebsiteContext) -> str:
+    """
+    Returns the user prompt with one website's settings filled in, leaving {blog_title} and {draft} to format.
+    Posts from the same website reuse the same skeleton.
+    """
+    return _USER_TMPL.format(blog_title="{blog_title}", draft="{draft}",
+                             brand_tone=_escape_braces(ctx.brand_tone), target_audience=_escape_braces(ctx.audience),
+                             min_len=ctx.min_len, max_len=ctx.max_len)
+
+def build_request(post_item: dict, website_settings: dict, raw_article_content: str) -> dict:
+    """Returns the chat.completions.create arguments for a refine request (shared with the batch runner)."""
+    raw_article_content = _bound_draft(raw_article_content)
+
+    # --- Extract Settings and Construct Prompt ---
+    blog_title = post_item.get(Constants.BLOG_TITLE, 'the provided topic') # Get from post_item
+    ctx = WebsiteContext.from_settings(website_settings)
+
+    # Dynamic values go in the user message; the static system prompt stays a cacheable prefix
+    prompt = _user_skeleton(ctx).format(blog_title=blog_title, draft=raw_article_content)
+    return {
+        "model": _select_model(website_settings),
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.6, # Adjust temperature as needed for creativity vs. adherence
+    }
+
+def execute(post_item: dict, website_settings: dict, event_data: dict) -> str:
+    """Refines the provided raw article text using OpenAI based on website settings."""
+    
+    raw_article_content = event_data.get('raw_article_content')
+    if not raw_article_content:
+        logger.error("Missing 'raw_article_content' in event_data for refine agent.")
+        raise ValueError("Missing 'raw_article_content' for refine agent.")
+    bypass_cache = bool(event_data.get(Constants.BYPASS_CACHE)) # Forces a fresh refine (X-Bypass-Cache)
+
+    logger.info(f"Starting refine process. Original length: {len(raw_article_content)}")
+
+    word_count = len(raw_article_content.split())
+    if word_count < MIN_REFINE_WORDS:
+        logger.warning(f"Draft has only {word_count} words (< {MIN_REFINE_WORDS}); returning it unrefined.")
+        return raw_article_content
+    if not bypass_cache and _refined_digests.get(_digest(raw_article_content)):
+        logger.info("Draft matches a recently refined output; returning it without another LLM call.")
+        return raw_article_content
+
+    request = build_request(post_item, website_settings, raw_article_content)
     logger.info("Constructed Refine Prompt - sending to LLM...")
 
     try:
         # --- Call LLM API ---
-        response = llm_client.chat.completions.create(
-            model="gpt-4o", # Or other capable model like gpt-4-turbo
-            messages=[
-                {"role": "system", "content": f"You are an expert copy editor rewriting content to fit specific brand guidelines (Tone: {brand_tone}) and length constraints ({min_len_str}-{max_len_str} words). Preserve all key information."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6, # Adjust temperature as needed for creativity vs. adherence
-        )
-        refined_article_content = response.choices[0].message.content
+        # Streamed: a full-length rewrite takes tens of seconds, and tokens arriving steadily keep the
+        # connection active and make time-to-first-token visible in the logs
+        # Re-running refine on an unchanged draft with unchanged settings is served from the exact cache
+        refined_article_content = cached_chat(stream=True, bypass_cache=bypass_cache, **request)
         if not refined_article_content:
              logger.error("LLM returned empty content after refine request.")
              raise ValueError("LLM returned empty content after refine request.")
 
         logger.info(f"LLM refine response received. Content length: {len(refined_article_content)}")
+        _refined_digests.set(_digest(refined_article_content), True)
         # logger.debug(f"Refine response snippet: {refined_article_content[:200]}...")
 
         return refined_article_content
 
     except Exception as e:
         logger.exception("An error occurred during the article refine LLM call.")
-        raise # Re-raise the exception to be caught by the service/handler
\ No newline at end of file
+        raise # Re-raise the exception to be caught by the service/handler
+
+execute_many = many(execute)
@@ -1,80 +1,93 @@
-import os
-import boto3
-from openai import OpenAI # Or your chosen LLM client library
+from functools import lru_cache
 
 from utils.logger_config import get_logger
+from utils.llm_cache import cached_chat
 from utils import constants as Constants
+from utils.concurrency import many
+from utils.website_context import WebsiteContext
 
 logger = get_logger(__name__)
 
-# Initialize clients (can still be global in this module if desired)
-try:
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key or api_key == "NOT_SET":
-         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
-    llm_client = OpenAI(api_key=api_key)
-    logger.info("OpenAI client initialized.")
-except Exception as e:
-    logger.exception("CRITICAL: Error initializing LLM client.")
-    llm_client = None
+# --- Prompt Templates ---
+# Identical for every request, so OpenAI's automatic prompt caching can reuse it as a prefix
+_SYSTEM_PROMPT = """You are an expert researcher and technical writer. Your task is to generate a comprehensive, deeply researched draft article on the topic you are given, for the target website described with it.
+
+**Instructions:**
+- Conduct thorough research on the topic. Cover all essential aspects, history (if relevant), current state, key concepts, examples, potential future developments, and related topics.
+- Structure the article logically with clear headings and subheadings.
+- The tone should be informative and authoritative, suitable for the target audience.
+- Aim for significant depth and detail. This is a first draft, so prioritize comprehensiveness over perfect prose or strict length limits at this stage.
+- Ensure factual accuracy.
+- Do **NOT** include placeholder text like "[Insert details here]". Generate the full content.
+- Output only the researched article content itself, starting with the title. Do not include introductory or concluding remarks about the generation process itself."""
+
+_SITE_TMPL = """**Context about the target website:**
+    - Description: {website_desc}
+    - Target Audience: {target_audience}
+    - Core Keywords: {core_keywords}"""
+
+_USER_TMPL = """
+    {site_context}
+
+    **Topic:** "{blog_title}"
+
+    Please write the draft article below:
+    """
+
+@lru_cache(maxsize=64)
+def _site_block(ctx: WebsiteContext) -> str:
+    """Returns the website-context part of the user prompt; posts from the same website reuse it."""
+    return _SITE_TMPL.format(website_desc=ctx.description, target_audience=ctx.audience, core_keywords=ctx.keywords_joined)
+
+def build_request(post_item: dict, website_settings: dict, content: str | None = None, ctx: WebsiteContext | None = None) -> dict:
+    """Returns the chat.completions.create arguments for a research request (shared with the batch runner)."""
+    blog_title = post_item.get(Constants.BLOG_TITLE)
+    ctx = ctx or WebsiteContext.from_settings(website_settings)
+
+    # Static instructions are the system prompt (a cacheable prefix); the topic and site context go last
+    prompt = _USER_TMPL.format(site_context=_site_block(ctx), blog_title=blog_title)
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+    }
 
 def execute(post_item: dict, website_settings: dict, event_data: dict | None = None) -> str:
     """Generates the research draft text using OpenAI based on input context."""
     
-    if not llm_client:
-        logger.error("LLM Client not initialized during function call.")
-        raise ValueError("LLM Client not initialized.")
-    
     blog_title = post_item.get(Constants.BLOG_TITLE)
     if not blog_title:
-         logger.error(f"Missing '{Constants.BLOG_TITLE}' in post_item for postId '{post_item.get(Constants.POST_ID)}'")
+         logger.error("Missing '%s' in post_item for postId '%s'", Constants.BLOG_TITLE, post_item.get(Constants.POST_ID))
          raise ValueError(f"Missing '{Constants.BLOG_TITLE}' in post item.")
     
-    logger.info(f"Generating research draft for Title: {blog_title}")
-
-    # Extract context from settings
-    website_desc = website_settings.get(Constants.WEBSITE_DESCRIPTION, '')
-    target_audience = website_settings.get(Constants.TARGET_AUDIENCE, 'a general audience')
-    core_keywords = website_settings.get(Constants.CORE_KEYWORDS, [])
-
-    prompt = f"""
-    Please act as an expert researcher and writer. Your task is to generate a comprehensive, deeply researched draft article on the topic: "{blog_title}".
+    logger.info("Generating research draft for Title: %s", blog_title)
 
-    **Context about the target website:**
-    - Description: {website_desc}
-    - Target Audience: {target_audience}
-    - Core Keywords: {', '.join(core_keywords) if core_keywords else 'N/A'}
-
-    **Instructions:**
-    - Conduct thorough research on the topic "{blog_title}". Cover all essential aspects, history (if relevant), current state, key concepts, examples, potential future developments, and related topics.
-    - Structure the article logically with clear headings and subheadings.
-    - The tone should be informative and authoritative, suitable for the target audience.
-    - Aim for significant depth and detail. This is a first draft, so prioritize comprehensiveness over perfect prose or strict length limits at this stage.
-    - Ensure factual accuracy.
-    - Do **NOT** include placeholder text like "[Insert details here]". Generate the full content.
-    - Output only the researched article content itself, starting with the title. Do not include introductory or concluding remarks about the generation process itself.
-    """
+    ctx = WebsiteContext.from_settings(website_settings)
+    request = build_request(post_item, website_settings, ctx=ctx)
     logger.info("Constructed Prompt - sending to LLM...")
 
     try:
         # Call LLM API
-        response = llm_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert researcher and technical writer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
-        raw_article_content = response.choices[0].message.content
+        # Streamed like refine: a long draft arrives as a steady token flow instead of one response after
+        # minutes of silence, and time-to-first-token is logged
+        # Exact-request cache only: titles that embed almost identically ("... in 2024" vs "... in 2025",
+        # "Why X works" vs "Why X doesn't work") need different articles, so no semantic matching here
+        # X-Bypass-Cache forces a new draft (the usual reason to re-run research on the same post)
+        raw_article_content = cached_chat(stream=True, bypass_cache=bool((event_data or {}).get(Constants.BYPASS_CACHE)),
+                                          **request)
         if not raw_article_content:
-            logger.error(f"LLM returned empty content for title: {blog_title}")
+            logger.error("LLM returned empty content for title: %s", blog_title)
             raise ValueError("LLM returned empty content.")
 
-        logger.info(f"LLM response received. Content length: {len(raw_article_content)}")
+        logger.info("LLM response received. Content length: %d", len(raw_article_content))
 
         return raw_article_content
 
     except Exception as e:
-        logger.exception(f"An error occurred during research draft generation for title '{blog_title}': {e}")
+        logger.exception("An error occurred during research draft generation for title '%s': %s", blog_title, e)
         raise
+
+execute_many = many(execute)
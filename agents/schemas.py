@@ -0,0 +1,80 @@
+from pydantic import BaseModel, AliasChoices, Field
+
+# --- LLM Response Schemas ---
+# Validation runs in pydantic-core (Rust) instead of hand-written isinstance chains.
+# Field aliases accept the alternative keys models sometimes use.
+
+class PromptSlugItem(BaseModel):
+    prompt: str = Field(min_length=1)
+    slug: str | None = None
+
+class PromptSlugResponse(BaseModel):
+    results: list[PromptSlugItem]
+
+class SlugResponse(BaseModel):
+    slugs: list[str] = Field(validation_alias=AliasChoices("slugs", "slug_list"))
+
+class MetadataResponse(BaseModel):
+    metaTitle: str
+    metaDescription: str
+    keywords: list[str]
+
+# --- Structured Output Schemas (response_format json_schema, strict mode) ---
+# Strict mode makes the model emit exactly this shape. Length limits are given as descriptions
+# because strict mode does not enforce maxLength/maxItems.
+
+METADATA_JSON_SCHEMA = {
+    "name": "seo_metadata",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "metaTitle": {"type": "string", "description": "SEO meta title, at most 70 characters."},
+            "metaDescription": {"type": "string", "description": "SEO meta description, at most 170 characters."},
+            "keywords": {"type": "array", "items": {"type": "string"}, "description": "5-10 relevant keywords/keyphrases."},
+        },
+        "required": ["metaTitle", "metaDescription", "keywords"],
+        "additionalProperties": False,
+    },
+}
+
+PROMPT_SLUG_JSON_SCHEMA = {
+    "name": "image_prompts",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "prompt": {"type": "string", "description": "Image generation prompt."},
+                        "slug": {"type": "string", "description": "Short URL-safe slug: lowercase letters, digits and hyphens."},
+                    },
+                    "required": ["prompt", "slug"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["results"],
+        "additionalProperties": False,
+    },
+}
+
+SLUG_JSON_SCHEMA = {
+    "name": "image_slugs",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "slugs": {
+                "type": "array",
+                "items": {"type": "string", "description": "Short URL-safe slug: lowercase letters, digits and hyphens."},
+                "description": "One slug per input prompt, in input order.",
+            },
+        },
+        "required": ["slugs"],
+        "additionalProperties": False,
+    },
+}
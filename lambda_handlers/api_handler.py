@@ -1,48 +1,153 @@
 # D:\Projects\Python\hcg-ai-content-generator\lambda_handlers\api_handler.py
-import json
+import orjson
+import logging
 import os
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger_config import setup_logging, get_logger
 from utils.errors import ServiceError
-
-from services.research_service import ResearchService
-from services.refine_service import RefineService
-from services.image_prompt_service import ImagePromptService
-from services.image_gen_service import ImageGenService
-from services.metadata_service import MetadataService
-from services.markdown_service import MarkdownService
+import utils.constants as Constants
 
 setup_logging() 
 logger = get_logger(__name__)
 
+# Services are imported on first use, so a cold start only loads the agent/SDK import graph of the
+# step it actually serves (e.g. markdown never imports openai). Python caches each module afterwards.
 SERVICE_MAP = {
-    "research": ResearchService,
-    "refine": RefineService,
-    "image_prompt": ImagePromptService,
-    "image_gen": ImageGenService,
-    "metadata": MetadataService,
-    "markdown": MarkdownService
+    "research": ("services.research_service", "ResearchService"),
+    "refine": ("services.refine_service", "RefineService"),
+    "image_prompt": ("services.image_prompt_service", "ImagePromptService"),
+    "image_gen": ("services.image_gen_service", "ImageGenService"),
+    "metadata": ("services.metadata_service", "MetadataService"),
+    "markdown": ("services.markdown_service", "MarkdownService")
+}
+
+# Steps whose output each step reads; only steps with no upstream relation may run concurrently
+STEP_DEPENDENCIES = {
+    "research": (),
+    "refine": ("research",),
+    "image_prompt": ("refine",),
+    "image_gen": ("image_prompt",),
+    "metadata": ("refine",),
+    "markdown": ("refine", "metadata", "image_gen")
+}
+
+def _upstream_steps(function_name: str) -> set[str]:
+    """Returns every step whose output function_name depends on, directly or through other steps."""
+    upstream = set()
+    pending = list(STEP_DEPENDENCIES.get(function_name, ()))
+    while pending:
+        step = pending.pop()
+        if step not in upstream:
+            upstream.add(step)
+            pending.extend(STEP_DEPENDENCIES.get(step, ()))
+    return upstream
+
+def _check_independent(function_names: list[str]) -> None:
+    """Raises ServiceError(400) if a step is requested together with one of its upstream steps."""
+    requested = set(function_names)
+    for name in function_names:
+        conflicts = _upstream_steps(name) & requested
+        if conflicts:
+            raise ServiceError(f"Step '{name}' depends on {sorted(conflicts)} and can't run concurrently with it; "
+                               f"call the steps in order.", 400, service_name="RequestParser")
+
+# Service instances built so far in this container, keyed by function name
+_service_instances: dict[str, object] = {}
+_service_instances_lock = threading.Lock()
+
+# Runs the services of a multi-step request side by side; one thread per registered service, reused across invocations
+_service_executor = ThreadPoolExecutor(max_workers=len(SERVICE_MAP), thread_name_prefix="service")
+
+def _load_service_class(function_name: str):
+    """Imports and returns the service class registered for function_name, or None if unknown."""
+    entry = SERVICE_MAP.get(function_name)
+    if not entry:
+        return None
+    module_name, class_name = entry
+    return getattr(importlib.import_module(module_name), class_name)
+
+# --- Init-time Priming ---
+def prime_connections():
+    """
+    Best-effort: imports every service and opens TLS connections to DynamoDB, S3 and OpenAI during init,
+    so the first request on this container doesn't pay for them. Lookups use keys that don't exist.
+    """
+    from services.base_service import get_db_helper
+    from utils.s3_helper import get_s3_client
+    from utils.openai_client import prewarm
+    for function_name in SERVICE_MAP:
+        _load_service_class(function_name)
+    try:
+        db_helper = get_db_helper()
+        db_helper.dynamodb_client.get_item(TableName=db_helper.posts_table_name, Key={Constants.POST_ID: {"S": "__prime__"}})
+    except Exception as e:
+        logger.warning("DynamoDB priming failed: %s", e)
+    try:
+        get_s3_client().head_object(Bucket=os.environ.get('CONTENT_BUCKET_NAME', ''), Key="__prime__")
+    except Exception as e: # A 404/403 still means the connection is open
+        logger.debug("S3 priming finished with: %s", e)
+    prewarm(force=True)
+
+# Provisioned-concurrency environments initialise ahead of traffic, so priming there is free for callers
+if os.environ.get('AWS_LAMBDA_INITIALIZATION_TYPE') == 'provisioned-concurrency':
+    prime_connections()
+elif os.environ.get('OPENAI_PREWARM', 'false').lower() == 'true':
+    from utils.openai_client import prewarm
+    prewarm() # Runs once per container during init
+
+# --- API Gateway Response Helper ---
+# Identical for every response, so built once; nothing downstream mutates it
+_RESPONSE_HEADERS = {
+    "Content-Type": "application/json",
+    # Every call runs (and bills) a generation step, so a cache in front must never replay or absorb one
+    "Cache-Control": "no-store",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,X-Bypass-Cache",
+    "Access-Control-Allow-Methods": "GET,OPTIONS" # Only allowing GET for now
 }
 
-# --- API Gateway Response Helper (remains the same) ---
 def format_response(status_code, body_dict):
     return {
         "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Content-Type",
-            "Access-Control-Allow-Methods": "GET,OPTIONS" # Only allowing GET for now
-        },
-        "body": json.dumps(body_dict)
+        "headers": _RESPONSE_HEADERS,
+        "body": orjson.dumps(body_dict).decode() # Compact output; API Gateway needs str, not bytes
     }
 
+# --- Request Parsing ---
+_REQUIRED_PARAMS = ('functionName', 'websiteId', 'postId')
+
+def _parse_request(event: dict) -> tuple[str, str, str]:
+    """
+    Returns (functionName, websiteId, postId) from the query string, or from the top level of a direct-invoke event.
+    Raises ServiceError(400) naming the first missing parameter.
+    """
+    query_params = event.get('queryStringParameters') or {}
+    # Direct invocations (Step Functions, other Lambdas, the console) may pass the parameters at the top level
+    if not query_params and 'functionName' in event:
+        query_params = event
+    values = tuple(query_params.get(name) for name in _REQUIRED_PARAMS)
+    for name, value in zip(_REQUIRED_PARAMS, values):
+        if not value:
+            logger.warning(f"Missing '{name}' query parameter.")
+            raise ServiceError(f"Missing required query parameter: {name}", 400, service_name="RequestParser")
+    return values
+
 # --- Main Handler Function ---
 def main(event, context):
     """
     API Gateway handler for various content generation functions, routed by query param.
     GET /content-api?functionName={func_name}&websiteId={websiteId}&postId={postId}
+    Also accepts a direct-invoke payload: {"functionName": ..., "websiteId": ..., "postId": ...}
     """
-    logger.debug("Received API Gateway event: %s", json.dumps(event, indent=2))
+    # Scheduled warm-up pings (EventBridge rule, or {"warmer": true}) only keep the container hot
+    if event.get('source') == 'aws.events' or event.get('warmer'):
+        logger.debug("Warm-up ping received.")
+        return format_response(200, {"warm": True})
+
+    if logger.isEnabledFor(logging.DEBUG): # Skip serialising the whole event when DEBUG is off
+        logger.debug("Received API Gateway event: %s", orjson.dumps(event).decode())
     
     function_name = None
     post_id = None 
@@ -50,39 +155,34 @@ def main(event, context):
 
     try:
         # --- 1. Parse Query String Parameters ---
-        query_params = event.get('queryStringParameters', {})
-        if query_params is None: query_params = {}
-             
-        function_name = query_params.get('functionName')
-        website_id = query_params.get('websiteId')
-        post_id = query_params.get('postId')
-
-        # Validate required parameters
-        if not function_name:
-            logger.warning("Missing 'functionName' query parameter.")
-            return format_response(400, {"error": "Missing required query parameter: functionName"})
-        if not website_id:
-            logger.warning("Missing 'websiteId' query parameter.")
-            return format_response(400, {"error": "Missing required query parameter: websiteId"})
-        if not post_id:
-            logger.warning("Missing 'postId' query parameter.")
-            return format_response(400, {"error": "Missing required query parameter: postId"})
+        function_name, website_id, post_id = _parse_request(event)
 
         logger.info(f"Handler invoked for functionName: '{function_name}', websiteId: '{website_id}', postId: '{post_id}'")
 
-        # --- 2. Get appropriate Service Instance ---
-        service_instance = get_service_instance(function_name)
+        # --- 2. Get appropriate Service Instance(s) ---
+        # A comma-separated functionName (e.g. "metadata,image_prompt") runs independent steps concurrently;
+        # repeated names run once, and a step listed with one of its upstream steps is rejected (STEP_DEPENDENCIES)
+        function_names = list(dict.fromkeys(name.strip().lower() for name in function_name.split(',') if name.strip()))
+        if not function_names:
+            raise ServiceError("functionName must name at least one step.", 400, service_name="RequestParser")
+        service_instances = [get_service_instance(name) for name in function_names]
+        if len(function_names) > 1:
+            _check_independent(function_names)
         
         # --- 3. Prepare data and Call Service's Process Method ---
         # The base class process_request expects a dictionary
         event_data_for_service = {
             "postId": post_id,
-            "websiteId": website_id
+            "websiteId": website_id,
+            Constants.BYPASS_CACHE: _wants_cache_bypass(event)
         }
         
         # The process_request method in the specific service (e.g., ResearchService)
         # will handle fetching necessary data (like websiteSettings, blogTitle)
-        result = service_instance.process_request(event_data=event_data_for_service)
+        if len(service_instances) == 1:
+            result = service_instances[0].process_request(event_data=event_data_for_service)
+        else:
+            result = run_services_concurrently(function_names, service_instances, event_data_for_service)
 
         # --- 4. Format Success Response ---
         logger.info(f"Request processed successfully for functionName '{function_name}', postId: {post_id}")
@@ -90,24 +190,89 @@ def main(event, context):
 
     except ServiceError as se: 
         logger.error(f"Service Error processing request (functionName: {function_name}, postId: {post_id}): {se}") 
-        return format_response(se.status_code, {"error": se.message}) 
+        body = {"error": se.message}
+        if isinstance(se.details, dict): # e.g. the per-step results/errors of a partly failed concurrent run
+            body.update(se.details)
+        return format_response(se.status_code, body) 
     except Exception as e: 
         logger.exception(f"Unhandled error in handler (functionName: {function_name}, postId: {post_id})")
         return format_response(500, {"error": "An unexpected internal error occurred."})
     
+def _wants_cache_bypass(event: dict) -> bool:
+    """True when the caller sent an X-Bypass-Cache header (any case) with a truthy value, e.g. after editing settings or to regenerate a step's output."""
+    headers = event.get('headers') or {}
+    value = next((v for k, v in headers.items() if k.lower() == 'x-bypass-cache'), '')
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+def run_services_concurrently(function_names: list[str], service_instances: list, event_data: dict) -> dict:
+    """
+    Runs independent services for the same post in parallel threads. The services spend
+    most of their time waiting on OpenAI, so the overall wall time is roughly the slowest step.
+    The steps share one postStatus attribute, so they leave it alone and a single combined status is written
+    here once all have finished: the earliest failed step's FAILED status (in pipeline order), otherwise the
+    latest step's COMPLETE status.
+    Returns {"results": {functionName: result}}. If any step failed, raises a ServiceError (status code of that
+    earliest failure) whose details carry the results of the steps that succeeded and the errors of the rest.
+    """
+    from services.base_service import get_db_helper
+    post_id = event_data[Constants.POST_ID]
+    pipeline = list(SERVICE_MAP)
+    ordered = sorted(zip(function_names, service_instances), key=lambda pair: pipeline.index(pair[0]))
+    db_helper = get_db_helper()
+    db_helper.update_post_item(post_id, {Constants.POST_STATUS: ordered[0][1].started_status})
+
+    logger.info(f"Running {len(service_instances)} services concurrently: {function_names}")
+    # Each service gets its own copy of event_data, so no service sees another's changes
+    step_event_data = {**event_data, Constants.DEFER_STATUS: True}
+    futures = [_service_executor.submit(service.process_request, event_data=dict(step_event_data)) for service in service_instances]
+
+    results = {}
+    errors = {}
+    for name, future in zip(function_names, futures):
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.error(f"Concurrent service '{name}' failed: {e}")
+            errors[name] = e
+
+    failed = [(name, service) for name, service in ordered if name in errors]
+    final_status = failed[0][1].failed_status if failed else ordered[-1][1].complete_status
+    if not db_helper.update_post_item(post_id, {Constants.POST_STATUS: final_status}):
+        logger.warning(f"Failed to write combined status '{final_status}' for postId {post_id}.")
+
+    if failed:
+        first_error = errors[failed[0][0]]
+        status_code = first_error.status_code if isinstance(first_error, ServiceError) else 500
+        raise ServiceError(f"{len(errors)} of {len(function_names)} steps failed.", status_code, service_name="ApiHandler",
+                           details={"results": results,
+                                    "errors": {name: (e.message if isinstance(e, ServiceError) else "An unexpected internal error occurred.")
+                                               for name, e in errors.items()}})
+    return {"results": results}
+
 def get_service_instance(function_name: str):
-    """Gets an instance of the appropriate service class based on the function name."""
+    """
+    Gets the instance of the appropriate service class based on the function name.
+    Services hold no per-request state, so one instance per name is built per container and reused by warm invocations.
+    """
 
     logger.info(f"Attempting to get service instance for functionName: '{function_name}'")
-    service_class = SERVICE_MAP.get(function_name.lower()) # Use lower case for case-insensitivity
+    function_name = function_name.lower() # Use lower case for case-insensitivity
+    service_instance = _service_instances.get(function_name)
+    if service_instance is not None:
+        return service_instance
 
+    service_class = _load_service_class(function_name)
     if not service_class:
         logger.error(f"Invalid function name provided: '{function_name}'")
         raise ServiceError(f"Invalid function name specified: {function_name}", 400, service_name="ServiceFactory")
     
     try:
-        # Instantiate the selected service class
-        service_instance = service_class() 
+        with _service_instances_lock:
+            # Re-check under the lock so concurrent first requests build the service only once
+            service_instance = _service_instances.get(function_name)
+            if service_instance is None:
+                service_instance = service_class() # Instantiate the selected service class
+                _service_instances[function_name] = service_instance
         return service_instance
     except ServiceError as se: # Catch init errors from Base class
         logger.exception(f"Initialization failed for service: {function_name}")
@@ -14,12 +14,8 @@ load_dotenv()
 from utils.errors import ServiceError
 from utils.logger_config import setup_logging # Ensure logging is set up
 
-from services.research_service import ResearchService
-from services.refine_service import RefineService
-from services.image_prompt_service import ImagePromptService
-from services.image_gen_service import ImageGenService
-from services.metadata_service import MetadataService
-from services.markdown_service import MarkdownService
+# Same service registry (and lazy imports) as the deployed Lambda, so local runs exercise the same code path
+from lambda_handlers.api_handler import get_service_instance
 
 # --- Test Configuration ---
 TEST_WEBSITE_ID = "my-test-blog-v1" # Use an ID that exists in your DynamoDB
@@ -41,13 +37,11 @@ def test_function(test_service: object) -> None:
 if __name__ == "__main__":
     setup_logging() # Set up logging based on LOG_LEVEL env var
 
+    # Usage: python local_test.py [functionName] - one of research, refine, image_prompt, image_gen, metadata, markdown
+    function_name = sys.argv[1] if len(sys.argv) > 1 else "markdown"
+
     try:
-        # test_function(ResearchService())
-        # test_function(RefineService())
-        # test_function(ImagePromptService())
-        # test_function(ImageGenService())
-        # test_function(MetadataService())
-        test_function(MarkdownService())
+        test_function(get_service_instance(function_name))
 
     except ServiceError as se:
         print(f"\n--- Test Failed (ServiceError) ---")
@@ -1,5 +1,8 @@
-import os
+import time
 from abc import ABC, abstractmethod # Import Abstract Base Classes tools
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.logger_config import get_logger
 from utils.dynamodb_helper import DynamoDBHelper
@@ -9,6 +12,45 @@ import utils.constants as Constants
 
 logger = get_logger(__name__)
 
+# Small pool for the DynamoDB calls each request overlaps (status write, settings read); shared by all
+# services in the container, and sized so concurrently running services don't queue behind each other
+_io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="service-io")
+
+# Returned by _save_agent_output when the output (and COMPLETE status) already went into the post item,
+# so the workflow skips the separate URI/status update
+SAVED_IN_ITEM = object()
+
+def _lap(timings: dict, name: str, since: float) -> float:
+    """Records the milliseconds elapsed since `since` under name in timings; returns the current time."""
+    now = time.perf_counter()
+    timings[name] = round((now - since) * 1000, 1)
+    return now
+
+# --- Shared Helpers ---
+# One DynamoDB/S3 helper per container, shared by every service, so boto3 resources and clients are
+# created once (during the first request or init priming) instead of once per service
+_helpers_lock = threading.Lock()
+_db_helper: DynamoDBHelper | None = None
+_s3_helper: S3Helper | None = None
+
+def get_db_helper() -> DynamoDBHelper:
+    """Returns the shared DynamoDBHelper, creating it on first use (a failed init is retried next time)."""
+    global _db_helper
+    if _db_helper is None:
+        with _helpers_lock:
+            if _db_helper is None:
+                _db_helper = DynamoDBHelper()
+    return _db_helper
+
+def get_s3_helper() -> S3Helper:
+    """Returns the shared S3Helper, creating it on first use (a failed init is retried next time)."""
+    global _s3_helper
+    if _s3_helper is None:
+        with _helpers_lock:
+            if _s3_helper is None:
+                _s3_helper = S3Helper()
+    return _s3_helper
+
 class BaseContentService(ABC):
     """
     Abstract Base Class for content generation services (Research, Rewrite, etc.).
@@ -18,10 +60,14 @@ class BaseContentService(ABC):
     def __init__(self, service_name: str):
         """Initializes common dependencies."""
         self.service_name = service_name
+        # Status strings are fixed per service, so they're built once rather than on every request
+        self._status_started = f"{self.status_prefix}{Constants.STATUS_STARTED_SUFFIX}"
+        self._status_complete = f"{self.status_prefix}{Constants.STATUS_COMPLETE_SUFFIX}"
+        self._status_failed = f"{self.status_prefix}{Constants.STATUS_FAILED_SUFFIX}"
         logger.info(f"Initializing {self.service_name}...")
         try:
-            self.db_helper = DynamoDBHelper()
-            self.s3_helper = S3Helper()
+            self.db_helper = get_db_helper()
+            self.s3_helper = get_s3_helper()
             # Agent client initialization happens within the specific agent modules
             logger.info(f"{self.service_name} initialized successfully.")
         except ValueError as e:
@@ -56,11 +102,37 @@ class BaseContentService(ABC):
         pass
 
     @abstractmethod
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
-        """Saves the agent's output (e.g., text, prompts) using the S3 helper and returns the S3 URI."""
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
+        """
+        Saves the agent's output (e.g., text, prompts) and returns the S3 URI (or SAVED_IN_ITEM if written to the post item).
+        Services that write the post item here also set postStatus to status, unless it is None.
+        """
         # Subclasses will define the S3 key structure and call s3_helper
         pass
 
+    @property
+    def post_attributes(self) -> tuple[str, ...] | None:
+        """
+        Post attributes this step reads (beyond postId and websiteId, which are always fetched).
+        None fetches the whole item; subclasses narrow it so large fields of other steps aren't read.
+        """
+        return None
+
+    @property
+    def started_status(self) -> str:
+        """Status string written when this service step starts."""
+        return self._status_started
+
+    @property
+    def complete_status(self) -> str:
+        """Status string written when this service step completes."""
+        return self._status_complete
+
+    @property
+    def failed_status(self) -> str:
+        """Status string written when this service step fails."""
+        return self._status_failed
+
     # --- Concrete Workflow Method ---
 
     def process_request(self, event_data: dict) -> dict:
@@ -73,20 +145,37 @@ class BaseContentService(ABC):
              logger.error(f"{self.service_name}: Missing postId or websiteId in input data.")
              raise ServiceError("Missing required input data for service.", 400, service_name=self.service_name)
 
-        current_status = f"{self.status_prefix}{Constants.STATUS_FAILED_SUFFIX}" # Default status in case of early exit in error block
+        current_status = self._status_failed # Default status in case of early exit in error block
+        # When deferred, the caller owns postStatus and this step leaves it untouched
+        defer_status = bool(event_data.get(Constants.DEFER_STATUS))
+        started_future = None
+        settings_future = None
+        # Step timings, emitted as one structured record when the request finishes (or fails)
+        summary = {"service": self.service_name, "postId": post_id, "websiteId": website_id}
+        request_start = step_start = time.perf_counter()
         
         try:
-            logger.info(f"[{self.service_name}] Starting process for postId: {post_id}, websiteId: {website_id}")
+            logger.debug(f"[{self.service_name}] Starting process for postId: {post_id}, websiteId: {website_id}")
+
+            # --- 1. Update Status: STARTED (in the background) ---
+            logger.debug("--- 1. Update Status: STARTED ---")
 
-            # --- 1. Update Status: STARTED ---
-            logger.info("--- 1. Update Status: STARTED ---")
+            # Independent of the reads below; it is awaited before any later status write so it can't land last
+            if not defer_status:
+                started_future = _io_executor.submit(self._update_status, post_id, self._status_started)
 
-            self._update_status(post_id, f"{self.status_prefix}{Constants.STATUS_STARTED_SUFFIX}")
+            # --- 2. Fetch Post Data & Website Settings, Validate Website ID ---
+            logger.debug("--- 2. Fetch Post Data & Website Settings, Validate Website ID ---")
 
-            # --- 2. Fetch Post Data & Validate Website ID ---
-            logger.info("--- 2. Fetch Post Data & Validate Website ID ---")
+            # Both reads are keyed by request parameters, so the settings read runs alongside get_post;
+            # the websiteId check below still gates any use of the settings
+            settings_future = _io_executor.submit(self.db_helper.get_website_settings, website_id,
+                                                  bypass_cache=bool(event_data.get(Constants.BYPASS_CACHE)))
 
-            post_item = self.db_helper.get_post(post_id)
+            attributes = self.post_attributes
+            if attributes is not None:
+                attributes = (Constants.POST_ID, Constants.WEBSITE_ID, *attributes)
+            post_item = self.db_helper.get_post(post_id, attributes=attributes)
             if not post_item:
                  raise ServiceError(f"Post with postId '{post_id}' not found.", 404, service_name=self.service_name)
             
@@ -98,55 +187,58 @@ class BaseContentService(ABC):
             if website_id != website_id_from_db:
                 logger.error(f"Forbidden: Query websiteId '{website_id}' != DB websiteId '{website_id_from_db}' for postId '{post_id}'")
                 raise ServiceError("Access denied: Website ID mismatch.", 403, service_name=self.service_name)
-            
-            # --- 3. Fetch Website Settings ---
-            logger.info("--- 3. Fetch Website Settings ---")
 
-            website_settings = self.db_helper.get_website_settings(website_id)
+            website_settings = settings_future.result()
+
             if not website_settings:
                 raise ServiceError(f"Website settings for websiteId '{website_id}' not found.", 404, service_name=self.service_name)
-            logger.info(f"Website settings fetched for websiteId: {website_id}")
+            logger.debug(f"Website settings fetched for websiteId: {website_id}")
+            step_start = _lap(summary, "fetch_ms", step_start)
             
             # --- 4. Select Agent ---
-            logger.info("--- 4. Select Agent ---")
+            logger.debug("--- 4. Select Agent ---")
 
             # Pass relevant data for agent selection if needed
             agent_function = self._select_agent(website_settings, post_item, event_data)
 
             # --- 5. Call Agent ---
-            logger.info("--- 5. Call Agent ---")
+            logger.debug("--- 5. Call Agent ---")
 
-            logger.info(f"[{self.service_name}] Calling agent function {agent_function.__name__}...")
+            logger.debug(f"[{self.service_name}] Calling agent function {agent_function.__name__}...")
             agent_output = self._call_agent(agent_function, post_item, website_settings, event_data)
             if agent_output is None: # Agent should raise errors, but check just in case
                 raise ServiceError("Agent returned None or empty output.", 500, service_name=self.service_name)
-            logger.info(f"[{self.service_name}] Agent completed.")
+            step_start = _lap(summary, "agent_ms", step_start)
 
             # --- 6. Save Output to S3 ---
-            logger.info("--- 6. Save Output to S3 ---")
+            logger.debug("--- 6. Save Output to S3 ---")
 
-            logger.info(f"[{self.service_name}] Saving agent output to S3...")
-            save_result = self._save_agent_output(website_id, post_id, agent_output) 
-            # save_result could be S3 URI or status string like "DynamoDB_Updated"
+            if started_future is not None:
+                started_future.result() # The STARTED write must not land after COMPLETE (some saves write it)
+            final_status = None if defer_status else self.complete_status
+
+            logger.debug(f"[{self.service_name}] Saving agent output to S3...")
+            save_result = self._save_agent_output(website_id, post_id, agent_output, status=final_status)
+            # save_result is the S3 URI, or SAVED_IN_ITEM if the output was written to the post item itself
             if save_result is None: 
                 raise ServiceError("Failed to save agent output.", 500, service_name=self.service_name)
-            logger.info(f"[{self.service_name}] Output saved successfully.")
-
-            # --- 7. Update Post Item URI ---
-            logger.info("--- 7. Update Post Item URI ---")
-
-            self._update_db_uri(post_id, save_result)
+            step_start = _lap(summary, "save_ms", step_start)
 
-            # --- 8. Update Status: COMPLETE ---
-            logger.info("--- 8. Update Status: COMPLETE ---")
+            # --- 7. Update Post Item URI & Status: COMPLETE ---
+            logger.debug("--- 7. Update Post Item URI & Status: COMPLETE ---")
 
-            current_status = f"{self.status_prefix}{Constants.STATUS_COMPLETE_SUFFIX}" # Update before final status update
-            self._update_status(post_id, current_status)
+            current_status = self.complete_status # Update before final status update
+            if save_result is not SAVED_IN_ITEM:
+                # One UpdateItem writes the output URI and the COMPLETE status together
+                self._update_db_uri(post_id, save_result, status=final_status)
+            _lap(summary, "update_ms", step_start)
 
-            # --- 9. Prepare Success Result ---
-            logger.info("--- 9. Prepare Success Result ---")
+            # --- 8. Prepare Success Result ---
+            logger.debug("--- 8. Prepare Success Result ---")
 
-            logger.info(f"[{self.service_name}] Successfully processed request for postId: {post_id}")
+            _lap(summary, "total_ms", request_start)
+            summary["status"] = current_status
+            logger.info(f"[{self.service_name}] svc_done {orjson.dumps(summary).decode()}")
             # Return a dictionary containing the key output URI and potentially other data
             result = {
                 "message": f"{self.service_name} processed successfully.",
@@ -158,9 +250,17 @@ class BaseContentService(ABC):
             return result
 
         except Exception as e:
-            logger.exception(f"[{self.service_name}] Error during process for postId {post_id}")
-            # Attempt final status update upon error
-            self._update_status(post_id, current_status) # Tries to set FAILED (or STARTED if error was early)
+            _lap(summary, "total_ms", request_start)
+            summary["statusCode"] = e.status_code if isinstance(e, ServiceError) else 500
+            summary["error"] = e.message if isinstance(e, ServiceError) else str(e)
+            logger.exception(f"[{self.service_name}] svc_failed {orjson.dumps(summary).decode()}")
+            if settings_future is not None:
+                settings_future.cancel() # Unused after a failed post lookup/ownership check; no-op once it's running
+            # Attempt final status update upon error (after the STARTED write, so FAILED is what remains).
+            # Skipped if this step never touched the status; conditional so a repeat FAILED isn't rewritten
+            if started_future is not None:
+                started_future.result()
+                self._update_status(post_id, current_status, skip_if_unchanged=True)
             # Re-raise specific ServiceErrors, wrap others
             if isinstance(e, ServiceError):
                 raise
@@ -169,22 +269,26 @@ class BaseContentService(ABC):
 
     # --- Internal Helper Methods ---
 
-    def _update_status(self, post_id: str, status: str):
+    def _update_status(self, post_id: str, status: str, skip_if_unchanged: bool = False):
         """Internal helper to update post status."""
         if not post_id: return # Cannot update if postId is missing
         logger.info(f"[{self.service_name}] Attempting to update status to '{status}' for postId '{post_id}'")
         # Use constant for attribute name
-        success = self.db_helper.update_post_item(post_id, {Constants.POST_STATUS: status})
+        success = self.db_helper.update_post_item(post_id, {Constants.POST_STATUS: status}, skip_if_unchanged=skip_if_unchanged)
         if not success:
             logger.warning(f"[{self.service_name}] Failed to update status to '{status}' for postId {post_id}.")
         return success
     
-    def _update_db_uri(self, post_id: str, s3_uri: str):
-        """Internal helper to update the output URI in DynamoDB."""
+    def _update_db_uri(self, post_id: str, s3_uri: str, status: str | None = None):
+        """Internal helper to update the output URI in DynamoDB, together with the post status if given."""
         if not post_id or not s3_uri: return
         logger.info(f"[{self.service_name}] Updating DB record for postId '{post_id}' with key '{self.output_uri_db_key}'")
         # Use constant for attribute name from subclass property
-        success = self.db_helper.update_post_item(post_id, {self.output_uri_db_key: s3_uri})
+        attributes = {self.output_uri_db_key: s3_uri}
+        if status:
+            attributes[Constants.POST_STATUS] = status
+        # Retries and re-runs usually write the same deterministic key, so identical values are skipped
+        success = self.db_helper.update_post_item(post_id, attributes, skip_if_unchanged=True)
         if not success:
             logger.warning(f"[{self.service_name}] Failed to update URI using key '{self.output_uri_db_key}' for postId {post_id}.")
         return success
\ No newline at end of file
@@ -1,14 +1,18 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger_config import get_logger
-from services.base_service import BaseContentService 
-from utils.dynamodb_helper import DynamoDBHelper
-from utils.s3_helper import S3Helper # To save images
+from services.base_service import BaseContentService, SAVED_IN_ITEM 
 from utils.errors import ServiceError 
-from agents.image_gen_openai import execute as generate_openai_image
 import utils.constants as Constants
 
 logger = get_logger(__name__)
 
+# Max number of DALL-E requests in flight at once for a single post
+IMAGE_GEN_CONCURRENCY = int(os.environ.get('IMAGE_GEN_CONCURRENCY', '4'))
+
+# Created once per container and reused by warm invocations, so a request doesn't spawn fresh threads
+_image_executor = ThreadPoolExecutor(max_workers=max(1, IMAGE_GEN_CONCURRENCY), thread_name_prefix="image-gen")
+
 class ImageGenService(BaseContentService): 
     """Orchestrates the image generation process."""
 
@@ -25,17 +29,23 @@ class ImageGenService(BaseContentService):
         # This service outputs a list of URIs to DynamoDB
         return Constants.IMAGE_URIS 
 
+    @property
+    def post_attributes(self) -> tuple[str, ...]:
+        return (Constants.IMAGE_PROMPTS,)
+
     # --- Implement Abstract Methods ---
 
     def _select_agent(self, website_settings: dict, post_item: dict | None = None, previous_step_output: any = None) -> callable:
         """Selects the image generation agent."""
         logger.info(f"[{self.service_name}] Selecting OpenAI DALL-E agent for image generation.")
+        from agents.image_gen_openai import execute as generate_openai_image # Imported on first use: pulls in the OpenAI SDK
         return generate_openai_image
 
     def _call_agent(self, agent_function: callable, post_item: dict, website_settings: dict, event_data: dict) -> any:
         """
         Calls the image generation agent for each prompt found in the post item.
-        Returns a list of dictionaries: [{'imageUrl': '...', 'slug': '...'}]
+        Each image is saved to S3 as soon as it is generated.
+        Returns a list of dictionaries: [{'imageUrl': '...', 'slug': '...', 's3Uri': '...'}]
         """
         
         prompt_slug_data = post_item.get(Constants.IMAGE_PROMPTS) 
@@ -44,31 +54,17 @@ class ImageGenService(BaseContentService):
             logger.error(f"Missing or invalid '{Constants.IMAGE_PROMPTS}' (list of dicts) in fetched post item for postId '{post_id}'.")
             raise ServiceError(f"Required '{Constants.IMAGE_PROMPTS}' not found/invalid for postId '{post_id}'. Has the image prompt step completed successfully?", 400, service_name=self.service_name)
             
-        generated_image_results = []
-        for i, item in enumerate(prompt_slug_data):
-            prompt = item.get("prompt")
-            slug = item.get("slug", f"image-{i}") # Default slug if missing
+        # DALL-E calls are slow and independent, so issue them concurrently (bounded by the pool size to respect rate limits)
+        max_workers = max(1, min(IMAGE_GEN_CONCURRENCY, len(prompt_slug_data)))
+        logger.info(f"[{self.service_name}] Generating {len(prompt_slug_data)} images with concurrency {max_workers}.")
 
-            if not prompt:
-                logger.warning(f"[{self.service_name}] Skipping item index {i} due to missing prompt.")
-                continue
+        futures = [
+            _image_executor.submit(self._generate_image, agent_function, post_item, website_settings, event_data, i, item, len(prompt_slug_data))
+            for i, item in enumerate(prompt_slug_data)
+        ]
+        # Preserve the original prompt order in the results
+        generated_image_results = [result for result in (f.result() for f in futures) if result]
 
-            logger.info(f"[{self.service_name}] Requesting image {i+1}/{len(prompt_slug_data)} for slug '{slug}', prompt: '{prompt[:80]}...'")
-            try:
-                event_data["prompt"] = prompt # Pass the prompt to the agent function
-                image_url = agent_function(
-                    post_item=post_item,
-                    website_settings=website_settings,
-                    event_data=event_data
-                )
-                if image_url:
-                    # Store both URL and slug for the save step
-                    generated_image_results.append({"imageUrl": image_url, "slug": slug}) 
-                else:
-                    logger.warning(f"[{self.service_name}] Agent returned no URL for prompt index {i}. Skipping.")
-            except Exception as e:
-                 logger.exception(f"[{self.service_name}] Failed to generate image for prompt index {i} (slug: {slug}). Error: {e}")
-                 
         if not generated_image_results:
             raise ServiceError("No images were successfully generated by the agent.", 500, service_name=self.service_name)
 
@@ -76,11 +72,45 @@ class ImageGenService(BaseContentService):
         # Return the list of result dictionaries
         return generated_image_results
 
+    def _generate_image(self, agent_function: callable, post_item: dict, website_settings: dict, event_data: dict, index: int, item: dict, total: int) -> dict | None:
+        """Generates a single image for one prompt/slug pair. Returns None if the image could not be generated."""
+        prompt = item.get("prompt")
+        slug = item.get("slug", f"image-{index}") # Default slug if missing
+
+        if not prompt:
+            logger.warning(f"[{self.service_name}] Skipping item index {index} due to missing prompt.")
+            return None
+
+        logger.info(f"[{self.service_name}] Requesting image {index+1}/{total} for slug '{slug}', prompt: '{prompt[:80]}...'")
+        try:
+            image_url = agent_function(
+                post_item=post_item,
+                website_settings=website_settings,
+                event_data={**event_data, "prompt": prompt} # Per-call copy, workers must not share the prompt
+            )
+            if image_url:
+                # Save to S3 right away so downloads overlap with the other prompts' DALL-E calls
+                s3_uri = self.s3_helper.download_and_save_image_with_slug(
+                    image_url=image_url,
+                    website_id=post_item.get(Constants.WEBSITE_ID),
+                    post_id=post_item.get(Constants.POST_ID),
+                    slug=slug
+                )
+                if not s3_uri:
+                    logger.warning(f"[{self.service_name}] Early S3 save failed for prompt index {index}, will retry in save step.")
+                # Store URL, slug and S3 URI (if saved) for the save step
+                return {"imageUrl": image_url, "slug": slug, "s3Uri": s3_uri}
+            logger.warning(f"[{self.service_name}] Agent returned no URL for prompt index {index}. Skipping.")
+        except Exception as e:
+            logger.exception(f"[{self.service_name}] Failed to generate image for prompt index {index} (slug: {slug}). Error: {e}")
+        return None
+
 
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
         """
-        Downloads images from URLs returned by the agent and saves them to S3.
-        Returns a placeholder string indicating success, as the final URIs are saved to DynamoDB.
+        Collects the S3 URIs of the generated images (downloading any image the agent step could not save)
+        and stores the list in DynamoDB.
+        Returns the SAVED_IN_ITEM placeholder indicating success, as the final URIs are saved to DynamoDB.
         """
         if not isinstance(agent_output, list) or not all(isinstance(d, dict) for d in agent_output):
             logger.error(f"[{self.service_name}] Agent output was not a list of dicts, cannot save images.")
@@ -91,6 +121,10 @@ class ImageGenService(BaseContentService):
             image_url = result_item.get("imageUrl")
             slug = result_item.get("slug", f"image-{i}") # Use slug from result
 
+            if result_item.get("s3Uri"):
+                image_s3_uris.append(result_item["s3Uri"]) # Already saved during generation
+                continue
+
             if not image_url:
                 logger.warning(f"[{self.service_name}] Skipping image save for index {i} due to missing URL.")
                 continue
@@ -116,21 +150,15 @@ class ImageGenService(BaseContentService):
         logger.info(f"[{self.service_name}] Successfully saved {len(image_s3_uris)} images to S3 for postId {post_id}.")
         
         # --- Save the LIST of S3 URIs to DynamoDB ---
-        update_success = self.db_helper.update_post_item(post_id, {Constants.IMAGE_URIS: image_s3_uris})
+        # Status COMPLETE (if given) is written in the same UpdateItem; this is the step's last write
+        attributes = {Constants.IMAGE_URIS: image_s3_uris}
+        if status:
+            attributes[Constants.POST_STATUS] = status
+        update_success = self.db_helper.update_post_item(post_id, attributes)
         if not update_success:
             logger.error(f"[{self.service_name}] Saved images to S3, but failed to update IMAGE_URIS in DynamoDB for postId {post_id}.")
             return None # Indicate failure to update DB
 
         logger.info(f"[{self.service_name}] Image S3 URIs successfully saved to DynamoDB for postId {post_id}.")
-        # Return placeholder string to signal overall success for this step
-        return "S3_And_DynamoDB_Updated"
-
-
-    # --- Override Base Class DB Update Method ---
-    def _update_db_uri(self, post_id: str, save_output_result: str | None):
-        """Overrides the base method because image URIs list is saved directly in the item during _save_agent_output."""
-        if save_output_result == "S3_And_DynamoDB_Updated":
-             logger.info(f"[{self.service_name}] Image URIs list already saved to DynamoDB item for postId {post_id}. Skipping standard URI update.")
-        else:
-             logger.error(f"[{self.service_name}] _save_agent_output did not indicate successful S3/DynamoDB update for postId {post_id}.")
-        return save_output_result == "S3_And_DynamoDB_Updated"
\ No newline at end of file
+        # Return placeholder to signal overall success for this step
+        return SAVED_IN_ITEM
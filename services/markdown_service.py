@@ -26,6 +26,10 @@ class MarkdownService(BaseContentService):
     def output_uri_db_key(self) -> str:
         return Constants.MARKDOWN_URI 
 
+    @property
+    def post_attributes(self) -> tuple[str, ...]:
+        return (Constants.REFINED_ARTICLE_URI, Constants.METADATA, Constants.IMAGE_URIS, Constants.BLOG_TITLE)
+
     # --- Implement Abstract Methods ---
 
     def _select_agent(self, website_settings: dict, post_item: dict | None = None, previous_step_output: any = None) -> callable:
@@ -48,22 +52,22 @@ class MarkdownService(BaseContentService):
         
         logger.info(f"[{self.service_name}] Refined article downloaded.")
 
-        # Prepare event_data for the agent
-        event_data["refined_article_content"] = refined_article_text
+        # Prepare event_data for the agent (its own dict, so the request's event_data isn't mutated)
+        event_data_for_agent = {"refined_article_content": refined_article_text}
 
         # Call the selected agent function
         # Agent returns the full markdown string
         markdown_content = agent_function(
             post_item=post_item, # Pass post_item for metadata, image URIs, title
             website_settings=website_settings, # Pass settings for potential formatting notes
-            event_data=event_data
+            event_data=event_data_for_agent
         )
         
         # Return the markdown string
         return markdown_content
 
 
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
         """Saves the final markdown content to S3."""
         if not isinstance(agent_output, str):
              logger.error(f"[{self.service_name}] Agent output was not a string, cannot save markdown.")
@@ -1,13 +1,11 @@
 import os
 
-from services.base_service import BaseContentService
+from services.base_service import BaseContentService, SAVED_IN_ITEM
 
 from utils.logger_config import get_logger
 from utils.errors import ServiceError
 from utils import constants as Constants
 
-from agents.metadata_openai import execute as generate_metadata_openai # Import agent's execute
-
 logger = get_logger(__name__)
 
 class MetadataService(BaseContentService): 
@@ -26,11 +24,16 @@ class MetadataService(BaseContentService):
         # This service outputs a dictionary directly to DynamoDB
         return Constants.METADATA 
 
+    @property
+    def post_attributes(self) -> tuple[str, ...]:
+        return (Constants.REFINED_ARTICLE_URI, Constants.BLOG_TITLE)
+
     # --- Implement Abstract Methods ---
 
     def _select_agent(self, website_settings: dict, post_item: dict | None = None, previous_step_output: any = None) -> callable:
         """Selects the metadata generation agent."""
         logger.info(f"[{self.service_name}] Selecting OpenAI agent for metadata.")
+        from agents.metadata_openai import execute as generate_metadata_openai # Imported on first use: pulls in the OpenAI SDK
         return generate_metadata_openai # Return the agent's execute function
 
     def _call_agent(self, agent_function: callable, post_item: dict, website_settings: dict, previous_step_output: dict) -> any:
@@ -50,7 +53,7 @@ class MetadataService(BaseContentService):
         logger.info(f"[{self.service_name}] Refined article downloaded.")
 
         # Prepare event_data for the agent (it needs the content)
-        event_data_for_agent = {"refined_article_content": refined_article_text}
+        event_data_for_agent = {"refined_article_content": refined_article_text, Constants.BYPASS_CACHE: event_data.get(Constants.BYPASS_CACHE)}
 
         # Call the selected agent function
         # Agent returns a dictionary: {"metaTitle": ..., "metaDescription": ..., "keywords": [...]}
@@ -64,7 +67,7 @@ class MetadataService(BaseContentService):
         return metadata_dict
 
 
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
         """Saves the metadata dictionary directly to DynamoDB."""
         if not isinstance(agent_output, dict):
              logger.error(f"[{self.service_name}] Agent output was not a dictionary, cannot save metadata.")
@@ -75,7 +78,11 @@ class MetadataService(BaseContentService):
         # Use the generic update method from the DB helper
         # The key is the constant for the metadata attribute
         # The value is the dictionary itself (agent_output)
-        update_success = self.db_helper.update_post_item(post_id, {Constants.METADATA: agent_output})
+        # Status COMPLETE (if given) is written in the same UpdateItem; this is the step's last write
+        attributes = {Constants.METADATA: agent_output}
+        if status:
+            attributes[Constants.POST_STATUS] = status
+        update_success = self.db_helper.update_post_item(post_id, attributes)
 
         if not update_success:
             logger.error(f"[{self.service_name}] Failed to save metadata to DynamoDB for postId {post_id}.")
@@ -83,14 +90,4 @@ class MetadataService(BaseContentService):
         
         logger.info(f"[{self.service_name}] Metadata successfully saved to DynamoDB for postId {post_id}.")
         # Return placeholder to signal success for this step
-        return "DynamoDB_Updated"
-
-
-    # --- Override Base Class DB Update Method ---
-    def _update_db_uri(self, post_id: str, save_output_result: str | None):
-        """Overrides the base method because metadata is saved directly in the item."""
-        if save_output_result == "DynamoDB_Updated": 
-             logger.info(f"[{self.service_name}] Metadata already saved to DynamoDB item for postId {post_id}. Skipping standard URI update.")
-        else:
-             logger.error(f"[{self.service_name}] _save_agent_output did not indicate successful DynamoDB update for postId {post_id}.")
-        return save_output_result == "DynamoDB_Updated"
\ No newline at end of file
+        return SAVED_IN_ITEM
@@ -7,8 +7,7 @@ from utils.s3_helper import S3Helper # Needed to read input
 from utils.errors import ServiceError
 import utils.constants as Constants
 
-# Import the specific agent implementation
-from agents.refine_openai import execute as refine_openai_content
+# The agent (and with it the OpenAI SDK) is imported in _select_agent, on first use
 
 logger = get_logger(__name__)
 
@@ -29,12 +28,17 @@ class RefineService(BaseContentService): # Inherit from base
         # The DynamoDB attribute name for this service's output URI
         return Constants.REFINED_ARTICLE_URI # Use constant from helper
 
+    @property
+    def post_attributes(self) -> tuple[str, ...]:
+        return (Constants.RESEARCH_ARTICLE_URI, Constants.BLOG_TITLE)
+
     # --- Implement Abstract Methods ---
 
     def _select_agent(self, website_settings: dict, post_item: dict | None = None, previous_step_output: any = None) -> callable:
         """Selects the refine agent."""
         # TODO: Add logic if multiple refine agents exist
         logger.info(f"[{self.service_name}] Selecting OpenAI agent for refine.")
+        from agents.refine_openai import execute as refine_openai_content # Imported on first use: pulls in the OpenAI SDK
         return refine_openai_content # Return the function object
 
     def _call_agent(self, agent_function: callable, post_item: dict, website_settings: dict, event_data: dict) -> any:
@@ -53,16 +57,15 @@ class RefineService(BaseContentService): # Inherit from base
         
         logger.info(f"[{self.service_name}] Raw article downloaded. Length: {len(raw_article_text)}")
 
-        event_data["raw_article_content"] = raw_article_text
-
         # Call the selected agent function (which is refine_openai_content)
+        # The text goes in its own dict so the request's event_data doesn't keep it alive after the call
         return agent_function(
             post_item=post_item,
             website_settings=website_settings,
-            event_data=event_data
+            event_data={"raw_article_content": raw_article_text, Constants.BYPASS_CACHE: event_data.get(Constants.BYPASS_CACHE)}
         )
 
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
         """Saves the refine agent's text output."""
         if not isinstance(agent_output, str):
              logger.error(f"[{self.service_name}] Agent output was not a string, cannot save.")
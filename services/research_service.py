@@ -9,8 +9,7 @@ from utils.s3_helper import S3Helper
 from utils.errors import ServiceError
 import utils.constants as Constants
 
-# Import the specific agent implementation
-from agents.research_openai import execute as generate_openai_draft
+# The agent (and with it the OpenAI SDK) is imported in _select_agent, on first use
 
 logger = get_logger(__name__)
 
@@ -31,12 +30,17 @@ class ResearchService(BaseContentService): # Inherit from base
         # The DynamoDB attribute name for this service's output URI
         return Constants.RESEARCH_ARTICLE_URI
 
+    @property
+    def post_attributes(self) -> tuple[str, ...]:
+        return (Constants.BLOG_TITLE,)
+
     # --- Implement Abstract Methods ---
 
     def _select_agent(self, website_settings: dict, post_item: dict | None = None, previous_step_output: any = None) -> callable:
         """Selects the research agent."""
         # TODO: Add logic if multiple research agents exist (e.g., check settings)
         logger.info(f"[{self.service_name}] Selecting OpenAI agent.")
+        from agents.research_openai import execute as generate_openai_draft # Imported on first use: pulls in the OpenAI SDK
         return generate_openai_draft # Return the function object
 
     def _call_agent(self, agent_function: callable, post_item: dict, website_settings: dict, event_data: dict) -> any:
@@ -52,7 +56,7 @@ class ResearchService(BaseContentService): # Inherit from base
             event_data=event_data
         )
 
-    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any) -> str | None:
+    def _save_agent_output(self, website_id: str, post_id: str, agent_output: any, status: str | None = None) -> str | None:
         """Saves the research agent's text output."""
         if not isinstance(agent_output, str):
              logger.error(f"[{self.service_name}] Agent output was not a string, cannot save.")
@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Default fan-out for bulk runs; the OpenAI client's own semaphore still caps in-flight requests
+BULK_CONCURRENCY = int(os.environ.get('BULK_CONCURRENCY', '16'))
+
+def run_many(fn, items: list, max_workers: int | None = None) -> list:
+    """
+    Calls fn(item) for every item on a thread pool and returns the results in input order.
+    A call that raises yields its exception in place of a result, so one failure doesn't sink the batch.
+    """
+    if not items:
+        return []
+    workers = max(1, min(max_workers or BULK_CONCURRENCY, len(items)))
+
+    def _safe_call(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_safe_call, items))
+
+    failed = sum(isinstance(result, Exception) for result in results)
+    logger.info("run_many finished %d items with %d workers (%d failed).", len(items), workers, failed)
+    return results
+
+def many(execute):
+    """
+    Returns an execute_many(jobs, max_workers=None) for an agent's execute(post_item, website_settings, event_data).
+    Each job is an argument tuple for execute; results follow run_many's ordering and error semantics.
+    """
+    def execute_many(jobs: list[tuple[dict, dict, dict | None]], max_workers: int | None = None) -> list:
+        return run_many(lambda job: execute(*job), jobs, max_workers=max_workers)
+    execute_many.__doc__ = f"Runs {execute.__module__}.execute() concurrently for several jobs (see utils.concurrency.many)."
+    return execute_many
@@ -26,6 +26,11 @@ NEGATIVE_IMAGE_PROMPTS = "negativeImagePrompts"
 CORE_KEYWORDS = "coreKeywords"
 NUM_IMAGE_PROMPTS = "numImagePrompts"
 SEO_INSTRUCTIONS = "seoInstructions"
+REFINE_MODEL = "refineModel" # Optional model override for the refine step
+
+# Request Options (passed to services in event_data)
+BYPASS_CACHE = "bypassCache" # Set from the X-Bypass-Cache header; forces fresh settings reads and LLM responses
+DEFER_STATUS = "deferStatus" # Set for steps run concurrently; the API handler writes one combined postStatus instead
 
 # S3 Key Prefixes / Names
 S3_RESEARCH_FILENAME = "research_article.txt"
@@ -1,18 +1,46 @@
 import os
 import boto3
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import time
 
 from utils.logger_config import get_logger
 import utils.constants as Constants
+from utils.cache import TTLCache
 
 logger = get_logger(__name__)
 
+# Keep-alive pool for the concurrent reads/writes of parallel steps; DynamoDB answers in milliseconds, so short
+# timeouts plus adaptive retries turn a stalled connection into a quick retry instead of a multi-second hang
+DYNAMODB_CLIENT_CONFIG = Config(max_pool_connections=20, tcp_keepalive=True, connect_timeout=1, read_timeout=3,
+                                retries={'mode': 'adaptive', 'max_attempts': 3})
+
+# Website settings are read-mostly and shared by every post of a site; warm containers reuse them for a few minutes.
+# SETTINGS_CACHE_TTL=0 effectively disables the cache (entries expire immediately).
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', '300'))
+_settings_cache = TTLCache(ttl_seconds=SETTINGS_CACHE_TTL, max_entries=256)
+
+# The helper is shared by the request thread and the service I/O pool, so it talks to DynamoDB through the low-level
+# client (thread-safe, unlike boto3 resources/Table objects) and converts items with boto3's stateless (de)serializers
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+def _serialize(data: dict) -> dict:
+    """Converts a plain dict to DynamoDB attribute values (same types the Table resource accepts)."""
+    return {key: _serializer.serialize(value) for key, value in data.items()}
+
+def _deserialize(item: dict | None) -> dict | None:
+    """Converts a DynamoDB item back to a plain dict (numbers come back as Decimal, as with the Table resource)."""
+    if item is None:
+        return None
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
 class DynamoDBHelper:
     """Handles interactions with DynamoDB tables."""
 
     def __init__(self):
-        """Initializes the helper and table resources."""
+        """Initializes the helper and the DynamoDB client."""
         self.posts_table_name = os.environ.get('POSTS_TABLE_NAME')
         self.settings_table_name = os.environ.get('SETTINGS_TABLE_NAME')
 
@@ -21,20 +49,22 @@ class DynamoDBHelper:
             raise ValueError("Missing DynamoDB table name environment variables (POSTS_TABLE_NAME, SETTINGS_TABLE_NAME)")
 
         try:
-            dynamodb_resource = boto3.resource('dynamodb')
-            self.posts_table = dynamodb_resource.Table(self.posts_table_name)
-            self.settings_table = dynamodb_resource.Table(self.settings_table_name)
+            self.dynamodb_client = boto3.client('dynamodb', config=DYNAMODB_CLIENT_CONFIG)
             logger.info(f"DynamoDBHelper initialized for tables: {self.posts_table_name}, {self.settings_table_name}")            
         except Exception as e:
-            logger.error(f"Error initializing DynamoDB resources: {e}")
-            raise ValueError("Failed to initialize DynamoDB table resources") from e
+            logger.error(f"Error initializing DynamoDB client: {e}")
+            raise ValueError("Failed to initialize DynamoDB client") from e
 
-    def get_post(self, post_id: str) -> dict | None:
-        """Gets an item from the Posts table by postId."""
+    def get_post(self, post_id: str, attributes: list[str] | tuple[str, ...] | None = None) -> dict | None:
+        """
+        Gets an item from the Posts table by postId.
+        With attributes, only those are fetched (a smaller read when the post carries large fields).
+        """
         logger.info(f"Getting post item with postId: {post_id}")
         try:
-            response = self.posts_table.get_item(Key={Constants.POST_ID: post_id})
-            item = response.get('Item')
+            response = self.dynamodb_client.get_item(TableName=self.posts_table_name, Key=_serialize({Constants.POST_ID: post_id}),
+                                                     **self._projection(attributes))
+            item = _deserialize(response.get('Item'))
             if item:
                 logger.debug("Post item found.")
             else:
@@ -44,25 +74,53 @@ class DynamoDBHelper:
             logger.error(f"DynamoDB Error getting post item '{post_id}': {e.response['Error']['Message']}")
             return None
 
-    def get_website_settings(self, website_id: str) -> dict | None:
-        """Gets an item from the WebsiteSettings table by websiteId."""
+    @staticmethod
+    def _projection(attributes) -> dict:
+        """Returns get_item kwargs projecting the given attribute names (aliased, so reserved words are safe)."""
+        if not attributes:
+            return {}
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        return {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+    def get_website_settings(self, website_id: str, bypass_cache: bool = False) -> dict | None:
+        """
+        Gets an item from the WebsiteSettings table by websiteId.
+        Found items are cached in-process; bypass_cache forces a fresh read (and refreshes the cache).
+        """
+        if not bypass_cache:
+            cached = _settings_cache.get(website_id)
+            if cached is not None:
+                logger.info(f"Website settings for websiteId '{website_id}' served from cache.")
+                return cached
         logger.info(f"Getting website settings with websiteId: {website_id}")
         try:
-            response = self.settings_table.get_item(Key={Constants.WEBSITE_ID: website_id})
-            item = response.get('Item')
+            response = self.dynamodb_client.get_item(TableName=self.settings_table_name, Key=_serialize({Constants.WEBSITE_ID: website_id}))
+            item = _deserialize(response.get('Item'))
             if item:
                 logger.debug("Website settings found.")
+                _settings_cache.set(website_id, item)
             else:
                 logger.debug("Website settings not found.")
+                _settings_cache.delete(website_id)
             return item
         except ClientError as e:
             logger.error(f"DynamoDB Error getting settings item '{website_id}': {e.response['Error']['Message']}")
             return None
 
-    def update_post_item(self, post_id: str, attributes_to_update: dict) -> bool:
+    @staticmethod
+    def invalidate_website_settings(website_id: str | None = None) -> None:
+        """Drops the cached settings for website_id (or all websites) so the next read goes to DynamoDB."""
+        if website_id is None:
+            _settings_cache.clear()
+        else:
+            _settings_cache.delete(website_id)
+
+    def update_post_item(self, post_id: str, attributes_to_update: dict, skip_if_unchanged: bool = False) -> bool:
         """
         Updates attributes for a specific post item in the Posts table.
         Automatically adds/updates the 'updateTimestamp' attribute.
+        With skip_if_unchanged, the write is conditional on at least one attribute differing, so a retried
+        request doesn't rewrite identical values (or bump the timestamp); a skipped write still returns True.
         """
         if not attributes_to_update:
             logger.warning(f"No attributes provided to update for postId: {post_id}")
@@ -75,6 +133,7 @@ class DynamoDBHelper:
 
         # Construct UpdateExpression and ExpressionAttributeValues dynamically
         update_expression_parts = []
+        condition_parts = []
         expression_attribute_values = {}
         expression_attribute_names = {}
 
@@ -85,11 +144,13 @@ class DynamoDBHelper:
             is_reserved = key.upper() in ["STATUS", "DATA", "KEY", "VALUE", "NAME"] # Add more if needed
             
             if is_reserved:
-                name_placeholder = f"#k{i}"
-                update_expression_parts.append(f"{name_placeholder} = {value_placeholder}")
-                expression_attribute_names[name_placeholder] = key
+                name = f"#k{i}"
+                expression_attribute_names[name] = key
             else:
-                update_expression_parts.append(f"{key} = {value_placeholder}")
+                name = key
+            update_expression_parts.append(f"{name} = {value_placeholder}")
+            if key != Constants.UPDATE_TIMESTAMP:
+                condition_parts.append(f"attribute_not_exists({name}) OR {name} <> {value_placeholder}")
                 
             expression_attribute_values[value_placeholder] = value
 
@@ -97,19 +158,27 @@ class DynamoDBHelper:
 
         try:
             update_kwargs = {
-                'Key': {Constants.POST_ID: post_id},
+                'TableName': self.posts_table_name,
+                'Key': _serialize({Constants.POST_ID: post_id}),
                 'UpdateExpression': update_expression,
-                'ExpressionAttributeValues': expression_attribute_values,
+                'ExpressionAttributeValues': _serialize(expression_attribute_values),
                 'ReturnValues': "NONE"
             }
+            if expression_attribute_names:
+                update_kwargs['ExpressionAttributeNames'] = expression_attribute_names
+            if skip_if_unchanged and condition_parts:
+                update_kwargs['ConditionExpression'] = " OR ".join(f"({part})" for part in condition_parts)
             
             logger.debug(f"DynamoDB update_item args for {post_id}: {update_kwargs}") # Log arguments for debug
             
-            self.posts_table.update_item(**update_kwargs)
+            self.dynamodb_client.update_item(**update_kwargs)
 
             logger.info(f"Post item '{post_id}' updated successfully.")
             return True
         except ClientError as e:
+            if skip_if_unchanged and e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                logger.info(f"Post item '{post_id}' already has these values; update skipped.")
+                return True
             logger.exception(f"DynamoDB Error updating post item '{post_id}' : {e}")
             return False
         except Exception as e:
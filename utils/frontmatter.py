@@ -0,0 +1,34 @@
+import re
+import json
+
+# Strings that can be written as plain (unquoted) YAML scalars without changing meaning
+_PLAIN_SCALAR_RE = re.compile(r"[A-Za-z][\w .,()/'-]*")
+# Plain words YAML would read as booleans/null instead of strings
+_YAML_RESERVED = {"true", "false", "yes", "no", "on", "off", "null", "y", "n"}
+
+def _scalar(value: str) -> str:
+    """Returns value as a YAML scalar, double-quoting it unless it is unambiguous plain text."""
+    if _PLAIN_SCALAR_RE.fullmatch(value) and not value.endswith(' ') and value.lower() not in _YAML_RESERVED:
+        return value
+    # A JSON string is a valid YAML double-quoted scalar
+    return json.dumps(value, ensure_ascii=False)
+
+def dump(data: dict) -> str:
+    """
+    Serializes flat front matter (string and list-of-string values) to YAML, in insertion order.
+    Values of any other type fall back to PyYAML, which is only imported when needed.
+    """
+    lines = []
+    for key, value in data.items():
+        if isinstance(value, str):
+            lines.append(f"{key}: {_scalar(value)}")
+        elif isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+            if not value:
+                lines.append(f"{key}: []")
+                continue
+            lines.append(f"{key}:")
+            lines.extend(f"- {_scalar(item)}" for item in value)
+        else:
+            import yaml
+            lines.append(yaml.safe_dump({key: value}, default_flow_style=False, allow_unicode=True, sort_keys=False).rstrip("\n"))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,180 @@
+import os
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import orjson
+
+from utils.logger_config import get_logger
+from utils.openai_client import get_client, call_chat, stream_chat_completion
+from utils.cache import TTLCache
+
+logger = get_logger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+
+def make_key(*parts) -> str:
+    """Builds a stable hash key from the given parts."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+def embed_text(text: str) -> list[float] | None:
+    """Returns a unit-length embedding for the text, or None if it could not be computed."""
+    if not CACHE_ENABLED or not text:
+        return None
+    try:
+        response = get_client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+        vector = response.data[0].embedding
+    except Exception as e:
+        # The cache must never break the pipeline - just skip it
+        logger.warning(f"Could not compute embedding for semantic cache: {e}")
+        return None
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+# Embeds texts for a cold namespace while the caller's LLM call runs (see SemanticCache.lookup)
+_embed_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed")
+
+def _resolved(value) -> Future:
+    """Returns an already-completed Future holding value."""
+    future = Future()
+    future.set_result(value)
+    return future
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache of LLM responses.
+    Entries only match within the same namespace (exact settings hash), either on the exact
+    input text or when the cosine similarity of the input embeddings reaches the threshold.
+    Lives for the lifetime of the (warm) Lambda container.
+    """
+
+    def __init__(self, name: str, threshold: float = 0.92, max_entries: int = 128):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # entry_id -> (namespace, text_key, vector, value)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, vector: list[float] | None):
+        """Returns the cached value of the most similar entry, or None on a miss."""
+        if vector is None:
+            return None
+        with self._lock:
+            best_id, best_sim = None, -1.0
+            for entry_id, (entry_namespace, _, entry_vector, _) in self._entries.items():
+                if entry_namespace != namespace:
+                    continue
+                # Vectors are normalized, so the dot product is the cosine similarity
+                sim = sum(a * b for a, b in zip(vector, entry_vector))
+                if sim > best_sim:
+                    best_id, best_sim = entry_id, sim
+            if best_id is None or best_sim < self.threshold:
+                return None
+            self._entries.move_to_end(best_id)
+            logger.info(f"Semantic cache '{self.name}' hit (similarity {best_sim:.3f}).")
+            return self._entries[best_id][3]
+
+    def put(self, namespace: str, vector: list[float] | None, value, text: str | None = None) -> None:
+        """Stores a value for the given namespace/embedding (and input text), evicting the oldest entries if full."""
+        if vector is None:
+            return
+        text_key = make_key(text) if text is not None else None
+        with self._lock:
+            if text_key is not None:
+                # A regenerated value (e.g. after a cache bypass) replaces the one stored for the same text
+                stale = [entry_id for entry_id, (entry_namespace, entry_text_key, _, _) in self._entries.items()
+                         if entry_namespace == namespace and entry_text_key == text_key]
+                for entry_id in stale:
+                    del self._entries[entry_id]
+            self._entries[self._next_id] = (namespace, text_key, vector, value)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, namespace: str, text: str, bypass: bool = False):
+        """
+        Returns (cached value or None, Future of the text's embedding to pass to store() on a miss).
+        An exact text match needs no embedding. A namespace without entries has nothing to compare against,
+        so its text is embedded in the background while the caller computes the response instead of before it.
+        With bypass, nothing is looked up (a forced regeneration), but the fresh value can still be stored.
+        """
+        if bypass:
+            return None, _embed_executor.submit(embed_text, text)
+        text_key = make_key(text)
+        with self._lock:
+            in_namespace = False
+            for entry_id, (entry_namespace, entry_text_key, _, value) in self._entries.items():
+                if entry_namespace != namespace:
+                    continue
+                in_namespace = True
+                if entry_text_key == text_key:
+                    self._entries.move_to_end(entry_id)
+                    logger.info(f"Semantic cache '{self.name}' exact hit.")
+                    return value, None
+        if not in_namespace:
+            return None, _embed_executor.submit(embed_text, text)
+        vector = embed_text(text)
+        return self.get(namespace, vector), _resolved(vector)
+
+    def store(self, namespace: str, text: str, pending_vector: Future | None, value) -> None:
+        """Stores a freshly computed value under the embedding returned by lookup()."""
+        if pending_vector is not None:
+            self.put(namespace, pending_vector.result(), value, text=text)
+
+# --- Cached Chat Completions ---
+# L1: exact request match; L2: same settings and a semantically near-identical input text
+_exact_chat_cache = TTLCache(ttl_seconds=3600, max_entries=256)
+_semantic_chat_cache = SemanticCache("chat_responses", threshold=0.92)
+# Callers sampling above this temperature want varied output, so their responses are never cached
+MAX_CACHEABLE_TEMPERATURE = 0.8
+
+def _request_key(kwargs: dict) -> str:
+    """Hashes the parts of a chat request that determine its output."""
+    request = {name: kwargs.get(name) for name in ("model", "messages", "temperature", "response_format")}
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+def cached_chat(semantic_namespace: str | None = None, semantic_text: str | None = None,
+                semantic_cache: SemanticCache | None = None, stream: bool = False, bypass_cache: bool = False,
+                **kwargs) -> str:
+    """
+    Calls chat.completions.create and returns the message content, caching responses in-process.
+    Identical requests are served from the exact cache. If semantic_text is given, requests in the
+    same semantic_namespace whose text embeds close enough to an earlier one reuse that response;
+    the namespace must capture every setting that changes the answer (title, keywords, ...).
+    semantic_cache overrides the shared L2 cache (e.g. for a stricter threshold); stream=True
+    fetches misses with stream_chat_completion. bypass_cache skips both lookups (the caller wants a fresh
+    response, e.g. a regenerated draft) but still caches the new response.
+    """
+    def compute() -> str:
+        if stream:
+            return stream_chat_completion(**kwargs)
+        return call_chat(**kwargs).choices[0].message.content
+
+    if not CACHE_ENABLED or (kwargs.get("temperature") or 0) > MAX_CACHEABLE_TEMPERATURE:
+        return compute()
+
+    exact_key = _request_key(kwargs)
+    cached = None if bypass_cache else _exact_chat_cache.get(exact_key)
+    if cached is not None:
+        logger.info("Exact chat cache hit for model %s.", kwargs.get("model"))
+        return cached
+
+    semantic_cache = semantic_cache or _semantic_chat_cache
+    pending_vector = None
+    namespace = None
+    if semantic_text is not None:
+        # Only reached on an exact-cache miss; a cold namespace embeds alongside the call below
+        namespace = make_key(semantic_namespace, kwargs.get("model"), kwargs.get("temperature"))
+        cached, pending_vector = semantic_cache.lookup(namespace, semantic_text, bypass=bypass_cache)
+        if cached is not None:
+            return cached
+
+    content = compute()
+    if content:
+        _exact_chat_cache.set(exact_key, content)
+        semantic_cache.store(namespace, semantic_text, pending_vector, content)
+    return content
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from functools import lru_cache
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# --- HTTP Transport Settings ---
+# Keep-alive pool shared by every agent so sequential calls (prompts -> images -> retries) reuse TLS sessions.
+# Sized so concurrent steps and image fan-out never queue behind each other for a connection.
+HTTP_POOL_SIZE = int(os.environ.get('OPENAI_HTTP_POOL_SIZE', '64'))
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=HTTP_POOL_SIZE, max_connections=HTTP_POOL_SIZE, keepalive_expiry=30.0)
+# Long read timeout for full-article completions; connects and pool waits fail fast instead
+HTTP_TIMEOUT = httpx.Timeout(float(os.environ.get('OPENAI_HTTP_TIMEOUT', '300')), connect=5.0, pool=10.0)
+# Transport-level retries only cover connection failures (e.g. a stale keep-alive socket); the SDK retries HTTP errors
+HTTP_CONNECT_RETRIES = 2
+
+# --- Chat Call Limits ---
+# Caps in-flight chat requests per container (concurrent steps, image fan-out, execute_many callers) so
+# bursts stay under the account's rate limits instead of stampeding into 429s and retries
+OPENAI_MAX_CONCURRENCY = int(os.environ.get('OPENAI_MAX_CONCURRENCY', '16'))
+_chat_semaphore = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+# --- Retry Policy ---
+# Applied client-wide (chat, embeddings, batch files). The SDK retries 429, 408/409, 5xx, timeouts and
+# connection errors with exponential backoff + jitter and honours Retry-After, so a transient rate limit
+# is absorbed here instead of failing the step and re-running already-paid calls.
+OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', '5'))
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """
+    Returns the shared OpenAI client, creating it on first use.
+    Keeps module import side-effect free; a failed init is not cached, so the next call retries.
+    """
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key or api_key == "NOT_SET":
+         logger.error("CRITICAL: OPENAI_API_KEY environment variable not set or invalid.")
+         raise ValueError("OPENAI_API_KEY environment variable not set or invalid")
+    # An explicit transport carries the pool limits and connect retries; DefaultHttpxClient keeps the SDK's redirect handling
+    transport = httpx.HTTPTransport(limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES)
+    client = OpenAI(api_key=api_key, max_retries=OPENAI_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(transport=transport, timeout=HTTP_TIMEOUT))
+    logger.info("Shared OpenAI client initialized.")
+    return client
+
+# --- Connection Prewarm ---
+# Opt-in: opening the first pooled connection during Lambda init moves the TLS handshake out of the first request
+OPENAI_PREWARM = os.environ.get('OPENAI_PREWARM', 'false').lower() == 'true'
+PREWARM_TIMEOUT = 2.0
+
+def prewarm(force: bool = False) -> None:
+    """
+    Best-effort: builds the shared client and opens a keep-alive connection to the API with a cheap GET.
+    Runs when OPENAI_PREWARM is set or force is True. Never raises; a failure only means the first real
+    request pays the handshake as before.
+    """
+    if not (OPENAI_PREWARM or force):
+        return
+    try:
+        start_time = time.monotonic()
+        get_client().with_options(max_retries=0, timeout=PREWARM_TIMEOUT).models.list()
+        logger.info("OpenAI connection prewarmed in %.0f ms.", (time.monotonic() - start_time) * 1000)
+    except Exception as e:
+        logger.warning("OpenAI connection prewarm failed: %s", e)
+
+def _log_usage(usage) -> None:
+    """Logs token usage, including how much of the prompt was served from OpenAI's prefix cache."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    logger.info("Token usage: prompt %d (cached %d), completion %d.", usage.prompt_tokens, cached_tokens, usage.completion_tokens)
+
+def call_chat(**kwargs):
+    """Calls chat.completions.create within the shared concurrency limit (retried per the client's policy). Returns the response."""
+    with _chat_semaphore:
+        response = get_client().chat.completions.create(**kwargs)
+    _log_usage(response.usage)
+    return response
+
+def stream_chat_completion(expect_json: bool = False, **kwargs) -> str:
+    """
+    Calls chat.completions.create with stream=True and returns the accumulated message content.
+    Logs time-to-first-token; with expect_json, aborts as soon as the output clearly isn't JSON.
+    """
+    start_time = time.monotonic()
+    parts = []
+    # The slot is held until the stream is fully read, since the request is in flight until then
+    with _chat_semaphore:
+        # include_usage adds a final chunk (with no choices) carrying the token usage
+        stream = get_client().chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **kwargs)
+        json_checked = not expect_json
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    _log_usage(getattr(chunk, "usage", None))
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    logger.info("First token received after %.2fs.", time.monotonic() - start_time)
+                parts.append(delta)
+                if not json_checked:
+                    head = "".join(parts).lstrip()
+                    if head:
+                        json_checked = True
+                        if head[0] not in "{[":
+                            # No point paying for the rest of a response we can't parse
+                            raise ValueError(f"LLM stream did not start with JSON: {head[:50]!r}")
+        finally:
+            stream.close()
+
+    content = "".join(parts)
+    logger.info("Stream complete after %.2fs. Content length: %d", time.monotonic() - start_time, len(content))
+    return content
@@ -0,0 +1,41 @@
+import time
+import threading
+from collections import deque
+
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+class RateLimiter:
+    """
+    Thread-safe sliding-window limiter: allows at most `rpm` acquisitions in any 60 second window.
+    Callers block in acquire() until a slot frees up, so bursts are smoothed instead of hitting 429s.
+    """
+
+    def __init__(self, rpm: int, name: str = "default"):
+        if rpm <= 0:
+            raise ValueError("RateLimiter rpm must be a positive integer")
+        self.rpm = rpm
+        self.name = name
+        self._window = 60.0
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent. Returns the number of seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # Drop calls that have left the window
+                while self._calls and now - self._calls[0] >= self._window:
+                    self._calls.popleft()
+                if len(self._calls) < self.rpm:
+                    self._calls.append(now)
+                    break
+                sleep_for = self._window - (now - self._calls[0])
+            # Log the wait so throttling can be told apart from API latency
+            logger.info(f"Rate limiter '{self.name}' at {self.rpm} RPM, waiting {sleep_for:.2f}s.")
+            time.sleep(sleep_for)
+            waited += sleep_for
+        return waited
@@ -1,15 +1,41 @@
 import os
+import io
+import codecs
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import requests
 import mimetypes
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import utils.constants as Constants
+from utils import slugify
+from utils.cache import TTLCache
 from utils.logger_config import get_logger
 
 logger = get_logger(__name__)
 
+# Ranged downloads: objects larger than one part are fetched as parallel byte ranges
+RANGED_PART_SIZE = 4 * 1024 * 1024
+RANGED_MAX_WORKERS = 8
+
+# Recently read text objects, keyed by (bucket, key) -> (ETag, text); revalidated with a conditional GET on each read
+_text_cache = TTLCache(ttl_seconds=900, max_entries=32)
+
+# Uploads at or above the threshold go through the transfer manager as parallel multipart parts
+MULTIPART_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024,
+                                           max_concurrency=4, use_threads=True)
+
+# Pool sized for the image fan-out and ranged downloads; adaptive retries back off when S3 throttles
+S3_CLIENT_CONFIG = Config(max_pool_connections=64, tcp_keepalive=True, retries={'mode': 'adaptive', 'max_attempts': 5})
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Returns the S3 client shared by every S3Helper in this container (created on first use)."""
+    return boto3.client('s3', config=S3_CLIENT_CONFIG)
+
 class S3Helper:
     """Handles interactions with the S3 bucket for blog content."""
 
@@ -21,7 +47,7 @@ class S3Helper:
             raise ValueError("CONTENT_BUCKET_NAME not configured for S3Helper")
             
         try:
-            self.s3_client = boto3.client('s3')
+            self.s3_client = get_s3_client()
             logger.info(f"S3Helper initialized for bucket: {self.bucket_name}")
         except Exception as e:
             logger.critical("CRITICAL INIT ERROR: Failed to initialize S3 client.")
@@ -33,12 +59,19 @@ class S3Helper:
         """
         logger.info(f"Uploading text file to s3://{self.bucket_name}/{key}")
         try:
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=content.encode('utf-8'),
-                ContentType='text/plain'
-            )
+            body = content.encode('utf-8')
+            if len(body) < MULTIPART_TRANSFER_CONFIG.multipart_threshold:
+                # Articles are tens of KB, far below the multipart threshold, so a single put_object is fastest
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=body,
+                    ContentType='text/plain'
+                )
+            else:
+                # Unusually large outputs upload as concurrent multipart parts
+                self.s3_client.upload_fileobj(io.BytesIO(body), self.bucket_name, key,
+                                              ExtraArgs={'ContentType': 'text/plain'}, Config=MULTIPART_TRANSFER_CONFIG)
             s3_uri = f"s3://{self.bucket_name}/{key}"
             logger.info(f"S3 Upload successful. URI: {s3_uri}")
             return s3_uri
@@ -64,8 +97,15 @@ class S3Helper:
             key = s3_uri[len(f"s3://{self.bucket_name}/"):]
             
             logger.debug(f"Downloading from bucket '{self.bucket_name}', key '{key}'")
-            s3_object = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-            content = s3_object['Body'].read().decode('utf-8')
+            # Conditional GET against the cached copy's ETag: an unchanged object costs a 304, not a download
+            cache_key = (self.bucket_name, key)
+            cached = _text_cache.get(cache_key)
+            content, etag = self._download_text(key, if_none_match=cached[0] if cached else None)
+            if content is None:
+                logger.info(f"S3 object unchanged since last read (ETag {etag}); using cached text.")
+                return cached[1]
+            if etag:
+                _text_cache.set(cache_key, (etag, content))
             logger.info(f"S3 Download successful. Content length: {len(content)}")
             return content
             
@@ -79,6 +119,60 @@ class S3Helper:
             logger.exception(f"An unexpected error occurred during S3 download from key {key}")
             return None
         
+    def _download_text(self, key: str, if_none_match: str | None = None) -> tuple[str | None, str | None]:
+        """
+        Downloads an object as UTF-8 text and returns (text, ETag); text is None if the object still has ETag if_none_match.
+        Parts are decoded one at a time and released as they go, so a multi-part object is never held as one
+        joined bytes copy alongside the decoded str.
+        """
+        parts, etag = self._download_parts(key, if_none_match)
+        if parts is None:
+            return None, etag
+        if len(parts) == 1:
+            return parts.pop().decode('utf-8'), etag
+        decoder = codecs.getincrementaldecoder('utf-8')() # Carries multi-byte characters split across part boundaries
+        chunks = []
+        for i in range(len(parts)):
+            chunks.append(decoder.decode(parts[i], final=(i == len(parts) - 1)))
+            parts[i] = None
+        return "".join(chunks), etag
+
+    def _download_parts(self, key: str, if_none_match: str | None = None) -> tuple[list[bytes] | None, str | None]:
+        """
+        Downloads an object's bytes as a list of consecutive parts and returns (parts, ETag).
+        The first request is a ranged GET for one part, which costs the same as a plain GET for typical articles;
+        if Content-Range shows the object is larger, the remaining parts are fetched concurrently (pinned to the
+        first response's ETag so all parts come from one version). With if_none_match, an unchanged object
+        returns (None, if_none_match) after a 304.
+        """
+        conditional = {'IfNoneMatch': if_none_match} if if_none_match else {}
+        try:
+            first = self.s3_client.get_object(Bucket=self.bucket_name, Key=key, Range=f"bytes=0-{RANGED_PART_SIZE - 1}", **conditional)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in ('304', 'NotModified'):
+                return None, if_none_match
+            if code == 'InvalidRange': # Empty object - no byte range is satisfiable
+                return [b""], None
+            raise
+        first_part = first['Body'].read()
+        content_range = first.get('ContentRange') # e.g. "bytes 0-4194303/12582912"
+        total_size = int(content_range.rsplit('/', 1)[1]) if content_range else len(first_part)
+        if total_size <= len(first_part):
+            return [first_part], first.get('ETag')
+
+        ranges = [(start, min(start + RANGED_PART_SIZE, total_size) - 1) for start in range(len(first_part), total_size, RANGED_PART_SIZE)]
+        logger.info(f"Downloading remaining {total_size - len(first_part)} bytes of {key} in {len(ranges)} ranged parts.")
+
+        def _get_range(byte_range: tuple[int, int]) -> bytes:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key, IfMatch=first['ETag'],
+                                                 Range=f"bytes={byte_range[0]}-{byte_range[1]}")
+            return response['Body'].read()
+
+        with ThreadPoolExecutor(max_workers=min(RANGED_MAX_WORKERS, len(ranges))) as executor:
+            parts = list(executor.map(_get_range, ranges))
+        return [first_part, *parts], first.get('ETag')
+
     def download_and_save_image(self, image_url: str, website_id: str, post_id: str, image_index: int) -> str | None:
         """
         Downloads an image from a URL and saves it to S3.
@@ -143,9 +237,7 @@ class S3Helper:
 
             # Clean the slug further (optional but recommended)
             # Keep alphanumeric and hyphen, ensure single hyphens
-            clean_slug = re.sub(r'[^a-z0-9-]+', '', slug.lower()) # Remove invalid chars
-            clean_slug = re.sub(r'-+', '-', clean_slug).strip('-') # Consolidate hyphens
-            if not clean_slug: clean_slug = "image" # Ensure not empty after cleaning
+            clean_slug = slugify.clean(slug) # Falls back to "image" if nothing is left after cleaning
             
             filename = f"{clean_slug}{extension}"
             s3_key = f"{website_id}/{post_id}/{Constants.S3_IMAGE_FOLDER}/{filename}"
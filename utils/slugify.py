@@ -0,0 +1,11 @@
+import re
+
+# Compiled once at import; cleanup runs for every slug the agents return and every image saved
+_SLUG_INVALID_RE = re.compile(r'[^a-z0-9-]+')
+_DASH_RE = re.compile(r'-+')
+
+def clean(slug, default: str = "image") -> str:
+    """Returns slug reduced to lowercase letters, digits and single hyphens, or default if nothing usable is left."""
+    if not isinstance(slug, str):
+        return default
+    return _DASH_RE.sub('-', _SLUG_INVALID_RE.sub('', slug.lower())).strip('-') or default
@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+import tiktoken
+
+from utils.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Tokenizer used by gpt-4o / gpt-4o-mini
+ENCODING_NAME = "o200k_base"
+
+# Article budget for the steps that only need the gist (metadata, image prompts); input tokens dominate their cost
+ARTICLE_SNIPPET_TOKENS = 3000
+
+# Character-based fallbacks for when the tokenizer can't be loaded, so token counting never fails a step
+CHARS_PER_TOKEN = 4 # Rough average for English text
+ARTICLE_SNIPPET_CHARS = 8000 # The snippet cap used before token budgets
+
+@lru_cache(maxsize=1)
+def get_encoding() -> tiktoken.Encoding | None:
+    """
+    Returns the shared tokenizer, loading it on first use, or None if it can't be loaded.
+    The BPE file ships in the dependencies layer (TIKTOKEN_CACHE_DIR); without it tiktoken downloads it, which
+    fails with no egress. A failure is cached too, so the container doesn't retry the download on every call.
+    """
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        logger.warning("Could not load tokenizer '%s' (%s); using character-based estimates.", ENCODING_NAME, e)
+        return None
+
+def count_tokens(text: str) -> int:
+    """Returns the number of model tokens in text (estimated from its length if the tokenizer is unavailable)."""
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    # disallowed_special=() so article text that happens to contain special-token markers is encoded as plain text
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Returns text cut down to at most max_tokens model tokens (unchanged if already within budget)."""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    token_ids = encoding.encode(text, disallowed_special=())
+    if len(token_ids) <= max_tokens:
+        return text
+    logger.debug("Truncating text from %d to %d tokens.", len(token_ids), max_tokens)
+    return encoding.decode(token_ids[:max_tokens])
+
+@lru_cache(maxsize=8)
+def article_snippet(article_text: str) -> str:
+    """
+    Returns the first ARTICLE_SNIPPET_TOKENS tokens of an article.
+    Cached so steps running in the same container (e.g. metadata and image prompts together) tokenize it once.
+    """
+    if get_encoding() is None:
+        return article_text[:ARTICLE_SNIPPET_CHARS]
+    return truncate_to_tokens(article_text, ARTICLE_SNIPPET_TOKENS)
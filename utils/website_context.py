@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+from utils.logger_config import get_logger
+from utils import constants as Constants
+
+logger = get_logger(__name__)
+
+@dataclass(frozen=True, slots=True)
+class WebsiteContext:
+    """
+    The website settings the prompt builders use, read and defaulted once.
+    Frozen and hashable, so per-website prompt pieces can be memoised on it.
+    """
+    description: str
+    audience: str
+    core_keywords: tuple[str, ...]
+    keywords_joined: str
+    brand_tone: str
+    min_len: str
+    max_len: str
+    seo_instructions: str
+
+    @classmethod
+    def from_settings(cls, website_settings: dict) -> "WebsiteContext":
+        # Numeric values are only used for prompt formatting; handle non-numeric data with defaults
+        try:
+            min_len = str(int(website_settings.get(Constants.ARTICLE_LENGTH_MIN, 1500)))
+            max_len = str(int(website_settings.get(Constants.ARTICLE_LENGTH_MAX, 2500)))
+        except (ValueError, TypeError):
+            logger.warning("Could not parse article length settings, using defaults for prompt.")
+            min_len, max_len = "1500", "2500"
+        core_keywords = tuple(website_settings.get(Constants.CORE_KEYWORDS) or ())
+        return cls(
+            description=str(website_settings.get(Constants.WEBSITE_DESCRIPTION, '')),
+            audience=str(website_settings.get(Constants.TARGET_AUDIENCE, 'a general audience')),
+            core_keywords=core_keywords,
+            keywords_joined=', '.join(core_keywords) if core_keywords else 'N/A',
+            brand_tone=str(website_settings.get(Constants.BRAND_TONE, 'neutral and informative')),
+            min_len=min_len,
+            max_len=max_len,
+            seo_instructions=str(website_settings.get(Constants.SEO_INSTRUCTIONS, "Generate standard SEO metadata.")),
+        )